@@ -1,19 +1,28 @@
-from flask import Flask, request, jsonify, send_file, render_template, redirect
+from flask import Flask, request, jsonify, render_template, redirect, Response, stream_with_context
+import click
 import os
 import json
 import tempfile
 import io
 import re
 import base64
+import codecs
+import csv
+import html
 import ast
+import heapq
+import importlib
 import time
 import secrets
-from urllib.parse import urlencode, urlparse, parse_qsl, urlunparse
+import threading
+import bisect
+import sqlite3
+from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlencode, urlparse, parse_qsl, urlunparse, quote
 from urllib.request import Request, urlopen
 from urllib.error import HTTPError, URLError
-from datetime import datetime, timezone
-import pandas as pd
-
+from datetime import datetime, timezone, timedelta
 try:
     import firebase_admin
     from firebase_admin import credentials
@@ -25,20 +34,121 @@ except Exception:
     admin_firestore = None
     admin_auth = None
 
+try:
+    from google.cloud.firestore_v1.base_query import FieldFilter
+except Exception:
+    FieldFilter = None
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+
+
+class _LazyModule:
+    """
+    무거운 의존성(pandas/numpy/openpyxl/pyarrow)은 처음 속성에 접근할 때 import.
+    가져오기/내보내기 경로에서만 쓰이므로 CRUD 요청만 받는 워커는 로딩 시간/메모리를 쓰지 않음
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._module = importlib.import_module(self._name)
+        return self._module
+
+    def __getattr__(self, attr):
+        return getattr(self._load(), attr)
+
+    def available(self):
+        """선택 의존성(pyarrow 등)이 설치되어 import 가능한지"""
+        try:
+            self._load()
+        except Exception:
+            return False
+        return True
+
+
+pd = _LazyModule("pandas")
+np = _LazyModule("numpy")
+openpyxl = _LazyModule("openpyxl")
+pa = _LazyModule("pyarrow")
+pq = _LazyModule("pyarrow.parquet")
+
 app = Flask(__name__)
 
 DATA_FILE = 'data.json'
+DATA_JOURNAL_FILE = DATA_FILE + '.journal'
 USERS_FILE = 'users.json'
+USERS_JOURNAL_FILE = USERS_FILE + '.journal'
+
+# 저널 레코드가 이 개수를 넘으면 백그라운드에서 data.json 스냅샷으로 압축
+DATA_JOURNAL_COMPACT_THRESHOLD = int(os.environ.get("DATA_JOURNAL_COMPACT_THRESHOLD", "5000"))
+# users.json.journal 레코드가 이 개수를 넘으면 users.json 으로 합침
+USERS_JOURNAL_COMPACT_THRESHOLD = int(os.environ.get("USERS_JOURNAL_COMPACT_THRESHOLD", "1000"))
 
 
 # ------------------ 공용 JSON 로드/저장 ------------------
-def save_data(data_list):
-    with open(DATA_FILE, 'w', encoding='utf-8') as f:
-        json.dump(data_list, f, ensure_ascii=False, indent=2)
+@contextmanager
+def _file_lock(path, exclusive=True, blocking=True):
+    """
+    gunicorn 워커(프로세스) 간 공유 락. 락을 얻었는지 여부를 yield.
+    exclusive=False 면 공유 락이라 읽기끼리는 서로 막지 않음.
+    fcntl 이 없는 환경(Windows 등)에서는 락 없이 진행.
+    """
+    if fcntl is None:
+        yield True
+        return
+    with open(path, 'a+') as f:
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(f.fileno(), flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+
+
+def _write_json_tmp(path, obj):
+    """path 와 같은 디렉터리의 임시 파일에 JSON 을 끝까지 쓰고 그 경로를 반환"""
+    dir_name = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(path) + '.', suffix='.tmp', dir=dir_name)
+    try:
+        with os.fdopen(fd, 'w', encoding='utf-8') as f:
+            json.dump(obj, f, ensure_ascii=False, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.chmod(tmp_path, 0o644)
+    except Exception:
+        os.remove(tmp_path)
+        raise
+    return tmp_path
+
+
+def _atomic_write_json(path, obj):
+    """임시 파일에 다 쓴 뒤 rename → 읽는 쪽은 항상 완성된 파일만 보게 됨"""
+    tmp_path = _write_json_tmp(path, obj)
+    try:
+        os.replace(tmp_path, path)
+    except Exception:
+        os.remove(tmp_path)
+        raise
 
 
 def load_data():
-    """data.json을 읽어서 리스트 반환 + id 없는 항목에 id 부여"""
+    """data.json(스냅샷)을 읽어서 리스트 반환 (id 보정은 _JournalStore 마이그레이션에서 한 번만)"""
     if not os.path.exists(DATA_FILE):
         return []
     try:
@@ -46,43 +156,819 @@ def load_data():
             data = json.load(f)
             if not isinstance(data, list):
                 return []
+        return data
+    except Exception:
+        return []
 
-        # id가 없는 기존 데이터에 id 자동 부여
-        changed = False
-        current_max_id = 0
-        for item in data:
-            try:
-                if 'id' in item:
-                    current_max_id = max(current_max_id, int(item.get('id', 0)))
-            except Exception:
-                pass
 
-        next_id = current_max_id + 1
+def _entry_fingerprint(item):
+    """
+    중복 내역 판별용 지문: (날짜, 금액, 대분류, 내용).
+    금액은 1000 / 1000.0 / '1000' 이 같은 값이 되도록 float 로 맞춤
+    """
+    amount = item.get("amount")
+    try:
+        amount = float(amount)
+    except (TypeError, ValueError):
+        amount = str(amount)
+    return (
+        str(item.get("date") or ""),
+        amount,
+        str(item.get("main_category") or ""),
+        str(item.get("memo") or ""),
+    )
+
+
+def _summary_amount(value):
+    """화면의 Number(amount) || 0 과 같은 규칙 (숫자가 아니면 0)"""
+    try:
+        amount = float(value)
+    except (TypeError, ValueError):
+        return 0.0
+    return amount if amount == amount else 0.0
+
+
+def _rollup_key(item):
+    """월/분류별 합계(rollup) 키: (월=날짜 앞 7자리, 대분류, 소분류) — 소분류가 비면 '기타'"""
+    return (
+        str(item.get("date") or "")[:7],
+        item.get("main_category") or "",
+        item.get("sub_category") or "기타",
+    )
+
+
+# ------------------ 로컬 저널 저장소 ------------------
+class _JournalStore:
+    """
+    data.json(스냅샷) + data.json.journal(추가 전용 로그) 기반 로컬 저장소.
+    - 시작 시 스냅샷을 읽고 저널을 재생해 메모리에 올림
+    - add/delete/clear 는 저널에 한 줄씩 append (변경량에 비례하는 비용)
+    - 저널이 커지면 백그라운드 스레드가 스냅샷으로 압축
+    - 사용자별 인덱스(_by_user)는 (날짜, id) 순으로 정렬된 키 목록을 유지
+    - 사용자별 지문 인덱스(_fingerprints)는 중복 가져오기 판별용 {지문: 건수}
+    - 사용자별 합계(_rollups)는 {(월, 대분류, 소분류): [금액 합, 건수]} 를 add/delete 때 갱신
+
+    여러 워커 프로세스가 같은 파일을 쓰는 경우:
+    - 쓰기는 data.json.lock 에 배타 락을 잡고, 다른 워커가 남긴 저널 꼬리를
+      먼저 반영한 뒤 append
+    - 읽기는 공유 락으로 저널 꼬리만 반영 (읽기끼리는 서로 막지 않음)
+    - 저널 첫 줄의 세대(gen) 값이 바뀌었으면 다른 워커가 압축한 것이므로 전체 재로딩
+
+    id 는 단조 증가 시퀀스(_next_id)에서 O(1)로 발급. 저널 헤더에 next_id 를 남겨
+    압축 후 재시작해도 삭제된 id 가 재사용되지 않음.
+    """
+
+    def __init__(self, data_path, journal_path, compact_threshold):
+        self.data_path = data_path
+        self.journal_path = journal_path
+        self.compacting_path = journal_path + '.compacting'
+        self.lock_path = data_path + '.lock'
+        self.compact_lock_path = data_path + '.compact.lock'
+        self.compact_threshold = compact_threshold
+        self._lock = threading.RLock()
+        self._loaded = False
+        self._items = {}
+        self._by_user = {}
+        self._fingerprints = {}
+        self._rollups = {}
+        self._next_id = 1
+        self._journal_gen = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._compact_thread = None
+
+    # ---- 로드 / 재생 ----
+    def _sync(self):
+        """(파일 락을 잡은 상태에서 호출) 메모리를 디스크 상태와 맞춤"""
+        if not self._loaded or not self._catch_up():
+            self._reload()
+
+    def _reload(self):
+        """(배타 락을 잡은 상태에서 호출) 스냅샷 + 저널로 메모리 전체를 다시 구성"""
+        self._items = {}
+        self._by_user = {}
+        self._fingerprints = {}
+        self._rollups = {}
+        self._next_id = 1
+        data = load_data()
+        if any(isinstance(item, dict) and 'id' not in item for item in data):
+            data = self._migrate_legacy_ids(data)
         for item in data:
-            if 'id' not in item:
-                item['id'] = next_id
-                next_id += 1
-                changed = True
+            if isinstance(item, dict):
+                self._apply_add(item)
+                self._bump_next_id(item.get("id"))
+        # 압축 도중인 저널이 있으면 먼저 재생 (재생은 멱등)
+        if os.path.exists(self.compacting_path):
+            with open(self.compacting_path, 'rb') as f:
+                self._apply_lines(f.read())
+        self._journal_gen = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._catch_up()
+        self._loaded = True
+        self._cleanup_interrupted_compaction()
+
+    def _cleanup_interrupted_compaction(self):
+        """
+        (배타 락을 잡은 상태에서 호출) 압축 도중 프로세스가 끝나 남은 흔적을 정리.
+        압축 락을 얻을 수 있을 때만 = 지금 어디서도 압축 중이 아닐 때만 지움
+        """
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+        with _file_lock(self.compact_lock_path, blocking=False) as acquired:
+            if not acquired:
+                return
+            dir_name = os.path.dirname(os.path.abspath(self.data_path))
+            prefix = os.path.basename(self.data_path) + '.'
+            for name in os.listdir(dir_name):
+                if name.startswith(prefix) and name.endswith('.tmp'):
+                    try:
+                        os.remove(os.path.join(dir_name, name))
+                    except FileNotFoundError:
+                        pass
+            if os.path.exists(self.compacting_path):
+                self._finish_interrupted_compaction()
+
+    def _finish_interrupted_compaction(self):
+        """(배타 락을 잡은 상태에서 호출) 현재 메모리 상태를 스냅샷으로 쓰고 압축 저널/저널을 비움"""
+        _atomic_write_json(self.data_path, list(self._items.values()))
+        for path in (self.compacting_path, self.journal_path):
+            if os.path.exists(path):
+                os.remove(path)
+        self._journal_gen = None
+        self._journal_offset = 0
+        self._journal_records = 0
+        self._append([])
+
+    def _catch_up(self):
+        """저널에서 아직 반영하지 않은 부분만 적용. 세대가 바뀌었으면 False"""
+        try:
+            f = open(self.journal_path, 'rb')
+        except FileNotFoundError:
+            return self._journal_gen is None
+        with f:
+            header = self._parse_line(f.readline())
+            gen = header.get("gen") if header and header.get("op") == "hdr" else None
+            if self._journal_gen is None and self._journal_offset == 0:
+                self._journal_gen = gen
+                self._journal_offset = f.tell()
+                if gen is not None:
+                    self._reserve_next_id(header.get("next_id"))
+            elif gen != self._journal_gen:
+                return False
+            f.seek(self._journal_offset)
+            self._journal_offset += self._apply_lines(f.read())
+        return True
+
+    def _apply_lines(self, chunk):
+        """완성된 줄(개행으로 끝나는 줄)만 적용하고 소비한 바이트 수를 반환"""
+        end = chunk.rfind(b'\n') + 1
+        for line in chunk[:end].splitlines():
+            record = self._parse_line(line)
+            if record is None:
+                continue
+            if record.get("op") == "hdr":
+                self._reserve_next_id(record.get("next_id"))
+                continue
+            self._apply_record(record)
+            self._journal_records += 1
+        return end
+
+    @staticmethod
+    def _parse_line(line):
+        line = line.strip()
+        if not line:
+            return None
+        try:
+            record = json.loads(line)
+        except Exception:
+            return None
+        return record if isinstance(record, dict) else None
+
+    def _apply_record(self, record):
+        op = record.get("op")
+        if op == "add":
+            item = record.get("item") or {}
+            self._apply_add(item)
+            self._bump_next_id(item.get("id"))
+        elif op == "del":
+            self._apply_delete(record.get("user"), record.get("id"))
+        elif op == "clear":
+            self._apply_clear(record.get("user"))
+
+    def _bump_next_id(self, used_id):
+        try:
+            self._next_id = max(self._next_id, int(used_id) + 1)
+        except Exception:
+            pass
 
-        if changed:
-            save_data(data)
+    def _reserve_next_id(self, next_id):
+        try:
+            self._next_id = max(self._next_id, int(next_id))
+        except Exception:
+            pass
 
+    def _migrate_legacy_ids(self, data):
+        """
+        id 가 없는 옛 data.json 항목에 id 를 한 번만 부여하고 스냅샷에 저장.
+        저널에 이미 발급된 id 와 겹치지 않도록 저널까지 훑어 시퀀스 시작점을 정함.
+        """
+        for item in data:
+            if isinstance(item, dict) and 'id' in item:
+                self._bump_next_id(item.get("id"))
+        for path in (self.compacting_path, self.journal_path):
+            if not os.path.exists(path):
+                continue
+            with open(path, 'rb') as f:
+                for line in f:
+                    record = self._parse_line(line) or {}
+                    if record.get("op") == "hdr":
+                        self._reserve_next_id(record.get("next_id"))
+                    elif record.get("op") == "add":
+                        self._bump_next_id((record.get("item") or {}).get("id"))
+        for item in data:
+            if isinstance(item, dict) and 'id' not in item:
+                item['id'] = self._next_id
+                self._next_id += 1
+        _atomic_write_json(self.data_path, data)
         return data
-    except Exception:
-        return []
 
+    @staticmethod
+    def _id_key(item_id):
+        try:
+            return int(item_id)
+        except Exception:
+            return item_id
+
+    @staticmethod
+    def _sort_key(item, id_key):
+        date = str(item.get("date") or "")
+        if isinstance(id_key, int):
+            return (date, id_key)
+        return (date, -1, str(id_key))
+
+    @staticmethod
+    def _key_to_id(sort_key):
+        return sort_key[1] if len(sort_key) == 2 else sort_key[2]
+
+    def _apply_add(self, item):
+        id_key = self._id_key(item.get("id"))
+        if id_key in self._items:
+            # 재생 시 같은 id 가 다시 들어오면 기존 인덱스 항목부터 정리
+            old = self._items[id_key]
+            self._apply_delete(old.get("user", "guest"), id_key)
+        self._items[id_key] = item
+        user_key = item.get("user", "guest")
+        keys = self._by_user.setdefault(user_key, [])
+        sort_key = self._sort_key(item, id_key)
+        if not keys or keys[-1] < sort_key:
+            keys.append(sort_key)
+        else:
+            bisect.insort(keys, sort_key)
+        counts = self._fingerprints.setdefault(user_key, {})
+        fingerprint = _entry_fingerprint(item)
+        counts[fingerprint] = counts.get(fingerprint, 0) + 1
+        total = self._rollups.setdefault(user_key, {}).setdefault(_rollup_key(item), [0.0, 0])
+        total[0] += _summary_amount(item.get("amount"))
+        total[1] += 1
+
+    def _owns(self, user_key, item_id):
+        item = self._items.get(self._id_key(item_id))
+        return item is not None and item.get("user", "guest") == user_key
+
+    def _apply_delete(self, user_key, item_id):
+        if not self._owns(user_key, item_id):
+            return False
+        id_key = self._id_key(item_id)
+        item = self._items.pop(id_key)
+        keys = self._by_user.get(user_key, [])
+        sort_key = self._sort_key(item, id_key)
+        pos = bisect.bisect_left(keys, sort_key)
+        if pos < len(keys) and keys[pos] == sort_key:
+            del keys[pos]
+        if not keys:
+            self._by_user.pop(user_key, None)
+        counts = self._fingerprints.get(user_key, {})
+        fingerprint = _entry_fingerprint(item)
+        if counts.get(fingerprint, 0) > 1:
+            counts[fingerprint] -= 1
+        else:
+            counts.pop(fingerprint, None)
+        totals = self._rollups.get(user_key, {})
+        rollup_key = _rollup_key(item)
+        total = totals.get(rollup_key)
+        if total is not None:
+            if total[1] > 1:
+                total[0] -= _summary_amount(item.get("amount"))
+                total[1] -= 1
+            else:
+                totals.pop(rollup_key)
+        return True
 
-def get_next_id(data):
-    current_max_id = 0
-    for item in data:
+    def _apply_clear(self, user_key):
+        self._fingerprints.pop(user_key, None)
+        self._rollups.pop(user_key, None)
+        keys = self._by_user.pop(user_key, [])
+        for sort_key in keys:
+            self._items.pop(self._key_to_id(sort_key), None)
+        return len(keys)
+
+    # ---- 저널 기록 / 압축 ----
+    @contextmanager
+    def _reading(self):
+        with self._lock:
+            with _file_lock(self.lock_path, exclusive=False):
+                fresh = self._loaded and self._catch_up()
+            if not fresh:
+                # 전체 재로딩(및 레거시 id 마이그레이션)은 드물게만 일어나므로 배타 락으로
+                with _file_lock(self.lock_path, exclusive=True):
+                    self._sync()
+            yield
+
+    @contextmanager
+    def _writing(self):
+        with self._lock:
+            with _file_lock(self.lock_path, exclusive=True):
+                self._sync()
+                yield
+
+    def _append(self, records):
+        """(배타 락을 잡은 상태에서 호출) 저널 끝에 레코드 추가"""
+        lines = []
+        if self._journal_gen is None:
+            self._journal_gen = secrets.token_hex(8)
+            lines.append({"op": "hdr", "gen": self._journal_gen, "next_id": self._next_id})
+        lines.extend(records)
+        payload = "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in lines).encode('utf-8')
+        with open(self.journal_path, 'ab') as f:
+            f.write(payload)
+            f.flush()
+            self._journal_offset = f.tell()
+        self._journal_records += len(records)
+        if self._journal_records >= self.compact_threshold:
+            self._start_compaction()
+
+    def _start_compaction(self):
+        if self._compact_thread is not None and self._compact_thread.is_alive():
+            return
+        self._compact_thread = threading.Thread(target=self.compact, name="journal-compact", daemon=True)
+        self._compact_thread.start()
+
+    def compact(self):
+        """현재 상태를 data.json 에 스냅샷으로 쓰고 저널을 비움"""
+        # 압축은 한 번에 한 워커만 (이미 누가 하고 있으면 건너뜀)
+        with _file_lock(self.compact_lock_path, blocking=False) as acquired:
+            if acquired:
+                self._compact()
+
+    def _compact(self):
+        with self._writing():
+            if os.path.exists(self.compacting_path):
+                # 이전 압축이 중단된 흔적 → 드문 경우라 락을 잡은 채로 마무리
+                self._finish_interrupted_compaction()
+                return
+            if os.path.exists(self.journal_path):
+                os.replace(self.journal_path, self.compacting_path)
+            self._journal_gen = None
+            self._journal_offset = 0
+            self._journal_records = 0
+            # 새 저널을 헤더만으로 바로 시작해 시퀀스(next_id)를 보존
+            self._append([])
+            snapshot = list(self._items.values())
+
+        # 스냅샷 쓰기는 락 밖에서 (그 사이 쓰기는 새 저널로 감)
+        tmp_path = _write_json_tmp(self.data_path, snapshot)
         try:
-            current_max_id = max(current_max_id, int(item.get('id', 0)))
+            # 스냅샷 교체와 압축 저널 삭제는 읽는 쪽이 그 사이를 보지 않도록 락 안에서
+            with self._lock:
+                with _file_lock(self.lock_path, exclusive=True):
+                    os.replace(tmp_path, self.data_path)
+                    if os.path.exists(self.compacting_path):
+                        os.remove(self.compacting_path)
         except Exception:
-            pass
-    return current_max_id + 1
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    # ---- 공개 연산 ----
+    def list_page(self, user_key, date_from=None, date_to=None, after=None, limit=None):
+        """
+        (날짜, id) 순으로 정렬된 인덱스에서 구간만 잘라 반환. 반환: (items, 다음 페이지 존재 여부)
+        after 는 직전 페이지 마지막 항목의 (date, id).
+        """
+        with self._reading():
+            keys = self._by_user.get(user_key, [])
+            lo, hi = 0, len(keys)
+            if date_from:
+                lo = bisect.bisect_left(keys, (date_from,))
+            if date_to:
+                hi = bisect.bisect_left(keys, (date_to + "\uffff",))
+            if after is not None:
+                after_key = self._sort_key({"date": after[0]}, self._id_key(after[1]))
+                lo = max(lo, bisect.bisect_right(keys, after_key))
+            end = hi if limit is None else min(hi, lo + limit)
+            items = [dict(self._items[self._key_to_id(k)]) for k in keys[lo:end]]
+            return items, end < hi
+
+    def all_users(self):
+        with self._reading():
+            return set(self._by_user.keys())
+
+    def fingerprint_counts(self, user_key, fingerprints):
+        """주어진 지문별로 이미 저장된 건수 (없으면 0)"""
+        with self._reading():
+            counts = self._fingerprints.get(user_key, {})
+            return {fp: counts.get(fp, 0) for fp in fingerprints}
+
+    def rollups(self, user_key, month=None):
+        """(월, 대분류, 소분류, 금액 합, 건수) 목록. month 를 주면 그 달만"""
+        with self._reading():
+            totals = self._rollups.get(user_key, {})
+            return [(m, main, sub, amount, count)
+                    for (m, main, sub), (amount, count) in totals.items()
+                    if month is None or m == month]
+
+    def rebuild_rollups(self, user_key=None):
+        """스냅샷 + 저널을 다시 읽어 합계를 새로 계산 (메모리 인덱스라 전체 재구성)"""
+        with self._lock:
+            with _file_lock(self.lock_path, exclusive=True):
+                self._reload()
+                if user_key is None:
+                    return len(self._rollups)
+                return 1 if user_key in self._rollups else 0
+
+    def add(self, user_key, item):
+        return self.add_bulk(user_key, [item])[0]
+
+    def add_bulk(self, user_key, items):
+        with self._writing():
+            added = []
+            for item in items:
+                new_item = dict(item)
+                new_item["id"] = self._next_id
+                new_item["user"] = user_key
+                self._next_id += 1
+                added.append(new_item)
+            self._append([{"op": "add", "item": it} for it in added])
+            for it in added:
+                self._apply_add(it)
+            return [dict(it) for it in added]
+
+    def delete(self, user_key, item_id):
+        with self._writing():
+            if not self._owns(user_key, item_id):
+                return False
+            self._append([{"op": "del", "user": user_key, "id": item_id}])
+            self._apply_delete(user_key, item_id)
+            return True
+
+    def clear(self, user_key):
+        with self._writing():
+            if user_key not in self._by_user:
+                return 0
+            self._append([{"op": "clear", "user": user_key}])
+            return self._apply_clear(user_key)
+
+    def snapshot(self):
+        """전체 항목 목록과 다음 id (SQLite 마이그레이션용)"""
+        with self._reading():
+            return [dict(v) for v in self._items.values()], self._next_id
+
+    # ---- 사용자 (users.json + users.json.journal) ----
+    def get_user(self, name):
+        return _USER_DIRECTORY.get(name)
+
+    def user_names(self):
+        return _USER_DIRECTORY.names()
+
+    def add_user(self, name, info):
+        return _USER_DIRECTORY.add(name, info)
+
+    def put_user(self, name, info):
+        _USER_DIRECTORY.put(name, info)
+
+    def delete_user(self, name):
+        return _USER_DIRECTORY.delete(name)
+
+
+# ------------------ 로컬 SQLite 저장소 ------------------
+class _SqliteStore:
+    """
+    SQLite(WAL 모드) 기반 로컬 저장소. _JournalStore 와 같은 인터페이스.
+    - (user, date, id) / (user, main_category, sub_category) 인덱스
+    - 스레드마다 커넥션 하나 (sqlite3 가 SQL 문자열 단위로 prepared statement 캐시)
+    - 처음 열 때 data.json(+저널) / users.json 을 한 번만 옮겨 옴
+    - rollups 테이블은 entries 의 INSERT/DELETE 트리거가 같은 트랜잭션 안에서 갱신
+    """
+
+    ENTRY_COLUMNS = ("id", "user", "date", "amount", "memo", "main_category", "sub_category")
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS entries (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user TEXT NOT NULL,
+            date TEXT NOT NULL DEFAULT '',
+            amount NUMERIC,
+            memo TEXT,
+            main_category TEXT,
+            sub_category TEXT
+        );
+        CREATE INDEX IF NOT EXISTS idx_entries_user_date ON entries (user, date, id);
+        CREATE INDEX IF NOT EXISTS idx_entries_user_category ON entries (user, main_category, sub_category);
+        CREATE TABLE IF NOT EXISTS users (
+            name TEXT PRIMARY KEY,
+            password TEXT NOT NULL DEFAULT '',
+            is_admin INTEGER NOT NULL DEFAULT 0
+        );
+        CREATE TABLE IF NOT EXISTS meta (
+            key TEXT PRIMARY KEY,
+            value TEXT
+        );
+        CREATE TABLE IF NOT EXISTS rollups (
+            user TEXT NOT NULL,
+            month TEXT NOT NULL,
+            main_category TEXT NOT NULL,
+            sub_category TEXT NOT NULL,
+            amount REAL NOT NULL DEFAULT 0,
+            count INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (user, month, main_category, sub_category)
+        ) WITHOUT ROWID;
+        CREATE TRIGGER IF NOT EXISTS trg_entries_rollup_insert AFTER INSERT ON entries BEGIN
+            INSERT INTO rollups (user, month, main_category, sub_category, amount, count)
+            VALUES (NEW.user, substr(NEW.date, 1, 7), COALESCE(NEW.main_category, ''),
+                    COALESCE(NULLIF(NEW.sub_category, ''), '기타'),
+                    CASE WHEN typeof(NEW.amount) IN ('integer', 'real') THEN NEW.amount ELSE 0 END, 1)
+            ON CONFLICT (user, month, main_category, sub_category) DO UPDATE SET
+                amount = amount + excluded.amount, count = count + 1;
+        END;
+        CREATE TRIGGER IF NOT EXISTS trg_entries_rollup_delete AFTER DELETE ON entries BEGIN
+            UPDATE rollups SET
+                amount = amount - CASE WHEN typeof(OLD.amount) IN ('integer', 'real') THEN OLD.amount ELSE 0 END,
+                count = count - 1
+            WHERE user = OLD.user AND month = substr(OLD.date, 1, 7)
+              AND main_category = COALESCE(OLD.main_category, '')
+              AND sub_category = COALESCE(NULLIF(OLD.sub_category, ''), '기타');
+            DELETE FROM rollups
+            WHERE user = OLD.user AND month = substr(OLD.date, 1, 7)
+              AND main_category = COALESCE(OLD.main_category, '')
+              AND sub_category = COALESCE(NULLIF(OLD.sub_category, ''), '기타')
+              AND count <= 0;
+        END;
+    """
+    SQL_INSERT = ("INSERT INTO entries (user, date, amount, memo, main_category, sub_category) "
+                  "VALUES (?, ?, ?, ?, ?, ?)")
+    SQL_INSERT_WITH_ID = ("INSERT OR REPLACE INTO entries (id, user, date, amount, memo, main_category, sub_category) "
+                          "VALUES (?, ?, ?, ?, ?, ?, ?)")
+    SQL_DELETE = "DELETE FROM entries WHERE id = ? AND user = ?"
+    SQL_CLEAR = "DELETE FROM entries WHERE user = ?"
+    SQL_USERS = "SELECT DISTINCT user FROM entries"
+    SQL_ROLLUPS = "SELECT month, main_category, sub_category, amount, count FROM rollups WHERE user = ?"
+    SQL_REBUILD_ROLLUPS = """
+        INSERT INTO rollups (user, month, main_category, sub_category, amount, count)
+        SELECT user, substr(date, 1, 7), COALESCE(main_category, ''), COALESCE(NULLIF(sub_category, ''), '기타'),
+               TOTAL(CASE WHEN typeof(amount) IN ('integer', 'real') THEN amount ELSE 0 END), COUNT(*)
+        FROM entries {where}
+        GROUP BY user, substr(date, 1, 7), COALESCE(main_category, ''), COALESCE(NULLIF(sub_category, ''), '기타')
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+        self._initialized = False
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        """
+        fork 된 자식은 부모(예: gunicorn --preload 에서 import 중 ensure_admin_user)가 연 커넥션을
+        쓰면 안 되므로 스레드별 커넥션을 비우고 새로 열게 함 (부모 커넥션은 닫지 않고 버림)
+        """
+        self._local = threading.local()
+        self._init_lock = threading.Lock()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, cached_statements=256)
+            conn.row_factory = sqlite3.Row
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            self._local.conn = conn
+        if not self._initialized:
+            with self._init_lock:
+                if not self._initialized:
+                    conn.executescript(self.SCHEMA)
+                    self._migrate_from_json(conn)
+                    self._backfill_rollups(conn)
+                    self._initialized = True
+        return conn
+
+    @contextmanager
+    def _transaction(self):
+        conn = self._conn()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _migrate_from_json(self, conn):
+        """data.json(+저널) 과 users.json 을 최초 1회만 옮겨 옴 (워커 간에는 BEGIN IMMEDIATE 로 직렬화)"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute("SELECT value FROM meta WHERE key = 'migrated_from_json'").fetchone()
+            if done is None:
+                items, next_id = _JournalStore(DATA_FILE, DATA_JOURNAL_FILE, DATA_JOURNAL_COMPACT_THRESHOLD).snapshot()
+                int_id_items, other_items = [], []
+                for item in items:
+                    item_id = _JournalStore._id_key(item.get("id"))
+                    (int_id_items if isinstance(item_id, int) else other_items).append((item_id, item))
+                conn.executemany(self.SQL_INSERT_WITH_ID, [
+                    (item_id, item.get("user", "guest"), str(item.get("date") or ""), item.get("amount"),
+                     item.get("memo"), item.get("main_category"), item.get("sub_category"))
+                    for item_id, item in int_id_items
+                ])
+                # 로컬 JSON 에서 쓰던 id 시퀀스를 이어서 사용
+                if next_id > 1:
+                    conn.execute("DELETE FROM sqlite_sequence WHERE name = 'entries'")
+                    conn.execute("INSERT INTO sqlite_sequence (name, seq) VALUES ('entries', ?)", (next_id - 1,))
+                # id 가 정수가 아닌 항목은 버리지 않고 시퀀스 뒤쪽의 새 id 로 옮김 (_migrate_legacy_ids 와 같은 방식)
+                if other_items:
+                    conn.executemany(self.SQL_INSERT, [
+                        (item.get("user", "guest"), str(item.get("date") or ""), item.get("amount"),
+                         item.get("memo"), item.get("main_category"), item.get("sub_category"))
+                        for _, item in other_items
+                    ])
+                    print(f"[WARN] {len(other_items)} entries with non-integer ids got new ids during SQLite migration")
+                conn.executemany(
+                    "INSERT OR IGNORE INTO users (name, password, is_admin) VALUES (?, ?, ?)",
+                    [(name, info.get("password", ""), int(bool(info.get("is_admin"))))
+                     for name, info in _USER_DIRECTORY.snapshot().items()]
+                )
+                conn.execute("INSERT INTO meta (key, value) VALUES ('migrated_from_json', ?)",
+                             (datetime.now(timezone.utc).isoformat(),))
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _backfill_rollups(self, conn):
+        """트리거가 생기기 전부터 있던 DB 는 rollups 를 최초 1회만 채움"""
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            done = conn.execute("SELECT value FROM meta WHERE key = 'rollups_built'").fetchone()
+            if done is None:
+                self._rebuild_rollups(conn)
+                conn.execute("INSERT INTO meta (key, value) VALUES ('rollups_built', ?)",
+                             (datetime.now(timezone.utc).isoformat(),))
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        conn.execute("COMMIT")
+
+    def _rebuild_rollups(self, conn, user_key=None):
+        if user_key is None:
+            conn.execute("DELETE FROM rollups")
+            conn.execute(self.SQL_REBUILD_ROLLUPS.format(where=""))
+        else:
+            conn.execute("DELETE FROM rollups WHERE user = ?", (user_key,))
+            conn.execute(self.SQL_REBUILD_ROLLUPS.format(where="WHERE user = ?"), (user_key,))
+
+    def _row_to_item(self, row):
+        return {col: row[col] for col in self.ENTRY_COLUMNS}
+
+    def list_page(self, user_key, date_from=None, date_to=None, after=None, limit=None):
+        """_JournalStore.list_page 와 같은 의미. 반환: (items, 다음 페이지 존재 여부)"""
+        sql = ["SELECT id, user, date, amount, memo, main_category, sub_category FROM entries WHERE user = ?"]
+        params = [user_key]
+        if date_from:
+            sql.append("AND date >= ?")
+            params.append(date_from)
+        if date_to:
+            sql.append("AND date < ?")
+            params.append(date_to + "\uffff")
+        if after is not None:
+            sql.append("AND (date > ? OR (date = ? AND id > ?))")
+            params.extend([after[0], after[0], after[1]])
+        sql.append("ORDER BY date, id")
+        if limit is not None:
+            sql.append("LIMIT ?")
+            params.append(limit + 1)
+        rows = self._conn().execute(" ".join(sql), params).fetchall()
+        has_more = limit is not None and len(rows) > limit
+        return [self._row_to_item(r) for r in rows[:limit]], has_more
+
+    def all_users(self):
+        return {r[0] for r in self._conn().execute(self.SQL_USERS)}
+
+    def fingerprint_counts(self, user_key, fingerprints):
+        """
+        _JournalStore.fingerprint_counts 와 같은 의미.
+        지문의 날짜들로 (user, date) 인덱스를 한 번에 조회해 건수를 셈
+        """
+        wanted = set(fingerprints)
+        counts = dict.fromkeys(wanted, 0)
+        dates = sorted({fp[0] for fp in wanted})
+        conn = self._conn()
+        for i in range(0, len(dates), 500):
+            part = dates[i:i + 500]
+            rows = conn.execute(
+                "SELECT date, amount, main_category, memo, COUNT(*) AS n FROM entries "
+                f"WHERE user = ? AND date IN ({','.join('?' * len(part))}) "
+                "GROUP BY date, amount, main_category, memo",
+                [user_key, *part],
+            ).fetchall()
+            for r in rows:
+                fp = _entry_fingerprint(dict(r))
+                if fp in counts:
+                    counts[fp] += r["n"]
+        return counts
+
+    def rollups(self, user_key, month=None):
+        """_JournalStore.rollups 와 같은 의미 (rollups 테이블의 기본키 구간만 읽음)"""
+        sql, params = self.SQL_ROLLUPS, [user_key]
+        if month is not None:
+            sql += " AND month = ?"
+            params.append(month)
+        return [tuple(r) for r in self._conn().execute(sql, params)]
+
+    def rebuild_rollups(self, user_key=None):
+        """entries 에서 rollups 를 다시 집계. 반환: 다시 만든 사용자 수"""
+        with self._transaction() as conn:
+            self._rebuild_rollups(conn, user_key)
+            if user_key is None:
+                return conn.execute("SELECT COUNT(DISTINCT user) FROM rollups").fetchone()[0]
+            return conn.execute("SELECT COUNT(*) > 0 FROM rollups WHERE user = ?", (user_key,)).fetchone()[0]
+
+    def add(self, user_key, item):
+        return self.add_bulk(user_key, [item])[0]
+
+    def add_bulk(self, user_key, items):
+        added = []
+        with self._transaction() as conn:
+            for item in items:
+                new_item = dict(item)
+                new_item["user"] = user_key
+                cur = conn.execute(self.SQL_INSERT, (
+                    user_key, str(item.get("date") or ""), item.get("amount"), item.get("memo"),
+                    item.get("main_category"), item.get("sub_category"),
+                ))
+                new_item["id"] = cur.lastrowid
+                added.append(new_item)
+        return added
+
+    def delete(self, user_key, item_id):
+        with self._transaction() as conn:
+            return conn.execute(self.SQL_DELETE, (item_id, user_key)).rowcount > 0
+
+    def clear(self, user_key):
+        with self._transaction() as conn:
+            return conn.execute(self.SQL_CLEAR, (user_key,)).rowcount
+
+    # ---- 사용자 (users 테이블의 기본키로 한 건씩 조회/기록) ----
+    def get_user(self, name):
+        row = self._conn().execute("SELECT password, is_admin FROM users WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            return None
+        return {"password": row["password"], "is_admin": bool(row["is_admin"])}
+
+    def user_names(self):
+        return [r[0] for r in self._conn().execute("SELECT name FROM users")]
+
+    def add_user(self, name, info):
+        with self._transaction() as conn:
+            return conn.execute(
+                "INSERT OR IGNORE INTO users (name, password, is_admin) VALUES (?, ?, ?)",
+                (name, info.get("password", ""), int(bool(info.get("is_admin")))),
+            ).rowcount > 0
+
+    def put_user(self, name, info):
+        with self._transaction() as conn:
+            conn.execute(
+                "INSERT INTO users (name, password, is_admin) VALUES (?, ?, ?) "
+                "ON CONFLICT (name) DO UPDATE SET password = excluded.password, is_admin = excluded.is_admin",
+                (name, info.get("password", ""), int(bool(info.get("is_admin")))),
+            )
 
+    def delete_user(self, name):
+        with self._transaction() as conn:
+            return conn.execute("DELETE FROM users WHERE name = ?", (name,)).rowcount > 0
 
-def load_users():
+
+# ------------------ 로컬 사용자 디렉터리 ------------------
+def _normalize_user_info(info):
+    """옛 형식(비밀번호 문자열)까지 {password, is_admin} 으로 맞춤. 알 수 없는 형식이면 None"""
+    if isinstance(info, str):
+        return {"password": info, "is_admin": False}
+    if isinstance(info, dict):
+        return {"password": info.get("password", ""), "is_admin": bool(info.get("is_admin", False))}
+    return None
+
+
+def _load_users_file():
     """users.json 로드 (dict: name -> {password, is_admin})"""
     if not os.path.exists(USERS_FILE):
         return {}
@@ -93,20 +979,177 @@ def load_users():
                 return {}
         users = {}
         for name, info in raw.items():
-            if isinstance(info, str):
-                users[name] = {"password": info, "is_admin": False}
-            elif isinstance(info, dict):
-                pwd = info.get("password", "")
-                is_admin = bool(info.get("is_admin", False))
-                users[name] = {"password": pwd, "is_admin": is_admin}
+            info = _normalize_user_info(info)
+            if info is not None:
+                users[name] = info
         return users
     except Exception:
         return {}
 
 
-def save_users(users: dict):
-    with open(USERS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(users, f, ensure_ascii=False, indent=2)
+class _UserDirectory:
+    """
+    users.json(스냅샷) + users.json.journal(추가 전용 로그) 을 메모리 dict 로 들고 있는 사용자 목록.
+    - 조회는 두 파일의 (mtime, 크기, inode) 만 확인하고 바뀌지 않았으면 메모리에서 O(1)
+    - 다른 워커가 쓰면 stat 값이 바뀌므로 다음 조회 때 다시 읽음
+    - 추가/변경/삭제는 저널에 한 줄 append (파일 전체를 다시 쓰지 않음)
+    - 저널이 USERS_JOURNAL_COMPACT_THRESHOLD 줄을 넘으면 users.json 으로 합치고 비움
+    """
+
+    def __init__(self, users_path, journal_path, compact_threshold):
+        self.users_path = users_path
+        self.journal_path = journal_path
+        self.lock_path = users_path + '.lock'
+        self.compact_threshold = compact_threshold
+        self._lock = threading.Lock()
+        self._users = {}
+        self._journal_records = 0
+        self._stamp = None
+
+    def _file_stamp(self):
+        stamp = []
+        for path in (self.users_path, self.journal_path):
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                stamp.append(None)
+                continue
+            stamp.append((st.st_mtime_ns, st.st_size, st.st_ino))
+        return tuple(stamp)
+
+    def _refresh(self):
+        """(self._lock 과 파일 락을 잡은 상태에서 호출) 파일이 바뀌었을 때만 다시 읽음"""
+        stamp = self._file_stamp()
+        if stamp == self._stamp:
+            return
+        # stat 을 먼저 떠 두었으므로 읽는 도중 바뀐 내용은 다음 조회 때 다시 반영됨
+        users = _load_users_file()
+        records = 0
+        try:
+            with open(self.journal_path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            data = b''
+        # 쓰는 중인 마지막 줄(개행 없음)은 건너뜀. 재생은 순서대로 덮어쓰므로 멱등
+        for line in data[:data.rfind(b'\n') + 1].splitlines():
+            record = _JournalStore._parse_line(line)
+            if record is None:
+                continue
+            records += 1
+            if record.get("op") == "put":
+                info = _normalize_user_info(record.get("info"))
+                if info is not None:
+                    users[record.get("name")] = info
+            elif record.get("op") == "del":
+                users.pop(record.get("name"), None)
+        self._users = users
+        self._journal_records = records
+        self._stamp = stamp
+
+    @contextmanager
+    def _reading(self):
+        with self._lock:
+            if self._file_stamp() != self._stamp:
+                # 다른 워커의 압축(users.json 교체 + 저널 삭제)이 읽는 도중에 끼지 않도록 공유 락
+                with _file_lock(self.lock_path, exclusive=False):
+                    self._refresh()
+            yield
+
+    @contextmanager
+    def _writing(self):
+        with self._lock:
+            with _file_lock(self.lock_path, exclusive=True):
+                self._refresh()
+                yield
+
+    def _append(self, record):
+        """(배타 락을 잡은 상태에서 호출) 저널에 한 줄 추가하고 메모리에 반영"""
+        with open(self.journal_path, 'ab') as f:
+            f.write((json.dumps(record, ensure_ascii=False) + "\n").encode('utf-8'))
+        if record["op"] == "put":
+            self._users[record["name"]] = record["info"]
+        else:
+            self._users.pop(record["name"], None)
+        self._journal_records += 1
+        if self._journal_records >= self.compact_threshold:
+            # 스냅샷을 먼저 바꾸고 저널을 지움 (그 사이에 읽어도 재생은 멱등)
+            _atomic_write_json(self.users_path, self._users)
+            os.remove(self.journal_path)
+            self._journal_records = 0
+        self._stamp = self._file_stamp()
+
+    def get(self, name):
+        with self._reading():
+            info = self._users.get(name)
+            return dict(info) if info is not None else None
+
+    def names(self):
+        with self._reading():
+            return list(self._users)
+
+    def snapshot(self):
+        with self._reading():
+            return {name: dict(info) for name, info in self._users.items()}
+
+    def add(self, name, info):
+        """없을 때만 추가. 이미 있으면 False"""
+        with self._writing():
+            if name in self._users:
+                return False
+            self._append({"op": "put", "name": name, "info": _normalize_user_info(info)})
+            return True
+
+    def put(self, name, info):
+        with self._writing():
+            info = _normalize_user_info(info)
+            if self._users.get(name) != info:
+                self._append({"op": "put", "name": name, "info": info})
+
+    def delete(self, name):
+        with self._writing():
+            if name not in self._users:
+                return False
+            self._append({"op": "del", "name": name})
+            return True
+
+
+_USER_DIRECTORY = _UserDirectory(USERS_FILE, USERS_JOURNAL_FILE, USERS_JOURNAL_COMPACT_THRESHOLD)
+
+
+# 로컬(비 Firestore) 저장소 선택: LOCAL_STORAGE_BACKEND=journal|sqlite
+LOCAL_STORAGE_BACKEND = os.environ.get("LOCAL_STORAGE_BACKEND", "journal").strip().lower()
+
+LOCAL_STORAGE_CONFIGS = {
+    "journal": {
+        "path": DATA_FILE,
+    },
+    "sqlite": {
+        "path_env": "SQLITE_PATH",
+        "default_path": "account_book.sqlite3",
+    },
+}
+
+
+def _init_local_store(backend):
+    if backend not in LOCAL_STORAGE_CONFIGS:
+        print(f"[WARN] unsupported LOCAL_STORAGE_BACKEND={backend}, fallback to journal")
+        backend = "journal"
+    cfg = LOCAL_STORAGE_CONFIGS[backend]
+    if backend == "sqlite":
+        return _SqliteStore(os.environ.get(cfg["path_env"]) or cfg["default_path"])
+    return _JournalStore(cfg["path"], DATA_JOURNAL_FILE, DATA_JOURNAL_COMPACT_THRESHOLD)
+
+
+LOCAL_STORE = _init_local_store(LOCAL_STORAGE_BACKEND)
+
+
+def get_user(name):
+    """사용자 한 명 조회 ({password, is_admin} 또는 None)"""
+    return LOCAL_STORE.get_user(name)
+
+
+def list_user_names():
+    return LOCAL_STORE.user_names()
 
 
 def ensure_admin_user():
@@ -114,12 +1157,11 @@ def ensure_admin_user():
     내부적으로는 '김준영' 이라는 관리자 계정을 유지.
     비밀번호 $Sin10029187, is_admin=True
     (화면에서는 '김준영 + $Sin10029187' 로 관리자로 로그인하게 만들 것)
+    이미 맞게 들어 있으면 (대부분의 워커 시작) 읽기만 하고 쓰지 않음
     """
-    users = load_users()
-    admin_info = users.get("김준영")
-    if not admin_info or admin_info.get("password") != "$Sin10029187" or not admin_info.get("is_admin", False):
-        users["김준영"] = {"password": "$Sin10029187", "is_admin": True}
-        save_users(users)
+    admin_info = {"password": "$Sin10029187", "is_admin": True}
+    if get_user("김준영") != admin_info:
+        LOCAL_STORE.put_user("김준영", admin_info)
 
 
 ensure_admin_user()
@@ -276,10 +1318,76 @@ def _init_firestore_client(target):
         return None
 
 
-FS_CLIENTS = {
-    "release": _init_firestore_client("release"),
-    "demo": _init_firestore_client("demo"),
-}
+# 대상별 Firestore 클라이언트는 처음 쓰일 때 한 번만 초기화 (실패 결과 None 도 그대로 보관).
+# import 시점에는 아무것도 하지 않음. FIRESTORE_WARMUP_TARGETS 를 지정하면(기본: 없음) 그 대상만
+# 워커의 첫 요청 때 백그라운드에서 동시에 미리 초기화 (gunicorn --preload 의 fork 이후라 안전)
+FS_CLIENTS = {}
+FS_INIT_TIMINGS = {}
+_FS_INIT_LOCKS = {target: threading.Lock() for target in SYNC_TARGET_CONFIGS}
+FIRESTORE_WARMUP_TARGETS = [
+    t.strip().lower() for t in os.environ.get("FIRESTORE_WARMUP_TARGETS", "").split(",")
+    if t.strip().lower() in SYNC_TARGET_CONFIGS
+]
+
+
+def _firestore_client(target):
+    """target 의 클라이언트 (초기화 실패 시 None). 같은 대상의 동시 호출은 한 번만 초기화"""
+    if target in FS_CLIENTS:
+        return FS_CLIENTS[target]
+    lock = _FS_INIT_LOCKS.get(target)
+    if lock is None:
+        return None
+    with lock:
+        if target in FS_CLIENTS:
+            return FS_CLIENTS[target]
+        started = time.perf_counter()
+        FS_INIT_TIMINGS[target] = {
+            "state": "initializing",
+            "started_at": datetime.now(timezone.utc).isoformat(),
+            "thread": threading.current_thread().name,
+        }
+        client = _init_firestore_client(target)
+        FS_INIT_TIMINGS[target].update({
+            "state": "ready" if client is not None else "failed",
+            "seconds": round(time.perf_counter() - started, 4),
+        })
+        # 그 사이 다른 곳에서 직접 넣어 둔 클라이언트가 있으면 그쪽을 유지
+        return FS_CLIENTS.setdefault(target, client)
+
+
+def _warm_up_firestore_clients(targets=None):
+    """대상마다 데몬 스레드를 띄워 동시에 초기화 (요청 처리는 기다리지 않음)"""
+    threads = []
+    for target in targets if targets is not None else FIRESTORE_WARMUP_TARGETS:
+        thread = threading.Thread(target=_firestore_client, args=(target,),
+                                  name=f"fs-warmup-{target}", daemon=True)
+        thread.start()
+        threads.append(thread)
+    return threads
+
+
+_FS_WARMUP_STARTED_PID = None
+
+
+@app.before_request
+def _start_firestore_warmup():
+    global _FS_WARMUP_STARTED_PID
+    if FIRESTORE_WARMUP_TARGETS and _FS_WARMUP_STARTED_PID != os.getpid():
+        _FS_WARMUP_STARTED_PID = os.getpid()
+        _warm_up_firestore_clients()
+
+
+def _reset_firestore_init_locks():
+    """fork 된 자식에서 부모의 (다른 스레드가 잡고 있었을 수 있는) 초기화 락을 새로 만듦"""
+    global _FS_INIT_LOCKS
+    _FS_INIT_LOCKS = {target: threading.Lock() for target in SYNC_TARGET_CONFIGS}
+    for target, timing in list(FS_INIT_TIMINGS.items()):
+        if timing.get("state") == "initializing" and target not in FS_CLIENTS:
+            FS_INIT_TIMINGS.pop(target, None)
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_firestore_init_locks)
 
 
 def _resolve_sync_target(sync_project):
@@ -290,8 +1398,7 @@ def _resolve_sync_target(sync_project):
 
 
 def _selected_firestore_client(sync_project=None):
-    target = _resolve_sync_target(sync_project)
-    return FS_CLIENTS.get(target)
+    return _firestore_client(_resolve_sync_target(sync_project))
 
 
 def _is_firestore_enabled(sync_project=None):
@@ -376,6 +1483,12 @@ def _is_not_found_error(exc):
     return "not found" in msg or "no user record" in msg or "user_not_found" in msg
 
 
+def _is_firestore_not_found(exc):
+    if type(exc).__name__ == "NotFound" or getattr(exc, "code", None) == 404:
+        return True
+    return _is_not_found_error(exc)
+
+
 def _resolve_social_uid_and_sync_user(provider, profile):
     """
     같은 이메일의 기존 Firebase 계정이 있으면 그 UID로 통합.
@@ -427,38 +1540,149 @@ def _resolve_social_uid_and_sync_user(provider, profile):
 
 
 SOCIAL_STATE_TTL_SECONDS = int(os.environ.get("SOCIAL_STATE_TTL_SECONDS", "600"))
-SOCIAL_STATE_STORE = {}
 
 
-def _cleanup_social_states():
-    now_ts = time.time()
-    expired_keys = []
-    for key, info in SOCIAL_STATE_STORE.items():
-        created_at = float(info.get("created_at", 0) or 0)
-        if now_ts - created_at > SOCIAL_STATE_TTL_SECONDS:
-            expired_keys.append(key)
-    for key in expired_keys:
-        SOCIAL_STATE_STORE.pop(key, None)
+class _MemorySocialStateStore:
+    """
+    프로세스 메모리 state 저장소 (워커 1개일 때).
+    만료 시각 순 힙으로 만료분만 앞에서부터 꺼내므로 요청당 O(log n) (전체 순회 없음)
+    """
+
+    def __init__(self, ttl_seconds):
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self._states = {}
+        self._expiry_heap = []
+
+    def _expire(self, now_ts):
+        heap = self._expiry_heap
+        while heap and heap[0][0] < now_ts:
+            _, state = heapq.heappop(heap)
+            info = self._states.get(state)
+            if info is not None and self._expires_at(info) < now_ts:
+                self._states.pop(state, None)
+
+    def _expires_at(self, info):
+        return float(info.get("created_at", 0) or 0) + self.ttl_seconds
+
+    def put(self, state, info):
+        with self._lock:
+            self._expire(time.time())
+            if state not in self._states:
+                heapq.heappush(self._expiry_heap, (self._expires_at(info), state))
+            self._states[state] = dict(info)
+
+    def get(self, state):
+        with self._lock:
+            self._expire(time.time())
+            info = self._states.get(state)
+            return dict(info) if info is not None else None
+
+    def pop(self, state):
+        with self._lock:
+            return self._states.pop(state, None) is not None
+
+
+class _SqliteSocialStateStore:
+    """
+    여러 gunicorn 워커가 공유하는 SQLite state 저장소 (콜백이 다른 워커로 가도 조회됨).
+    만료 시각 인덱스로 만료분만 지우고, 지우는 작업은 생성 시에만 함
+    """
+
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS social_states (
+            state TEXT PRIMARY KEY,
+            info TEXT NOT NULL,
+            expires_at REAL NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS idx_social_states_expires ON social_states (expires_at);
+    """
+
+    def __init__(self, db_path, ttl_seconds):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self._local = threading.local()
+        if hasattr(os, "register_at_fork"):
+            os.register_at_fork(after_in_child=self._reset_after_fork)
+
+    def _reset_after_fork(self):
+        """_SqliteStore._reset_after_fork 와 같은 이유로 부모의 커넥션을 버림"""
+        self._local = threading.local()
+
+    def _conn(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("PRAGMA busy_timeout=30000")
+            conn.executescript(self.SCHEMA)
+            self._local.conn = conn
+        return conn
+
+    def put(self, state, info):
+        now_ts = time.time()
+        conn = self._conn()
+        conn.execute("DELETE FROM social_states WHERE expires_at < ?", (now_ts,))
+        conn.execute(
+            "INSERT OR REPLACE INTO social_states (state, info, expires_at) VALUES (?, ?, ?)",
+            (state, json.dumps(info, ensure_ascii=False),
+             float(info.get("created_at", 0) or 0) + self.ttl_seconds),
+        )
+
+    def get(self, state):
+        row = self._conn().execute(
+            "SELECT info FROM social_states WHERE state = ? AND expires_at >= ?", (state, time.time())
+        ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def pop(self, state):
+        return self._conn().execute("DELETE FROM social_states WHERE state = ?", (state,)).rowcount > 0
+
+
+# state 저장소 선택: SOCIAL_STATE_BACKEND=memory|sqlite (워커가 여러 개면 sqlite)
+SOCIAL_STATE_BACKEND = os.environ.get("SOCIAL_STATE_BACKEND", "memory").strip().lower()
+
+SOCIAL_STATE_STORE_CONFIGS = {
+    "memory": {},
+    "sqlite": {
+        "path_env": "SOCIAL_STATE_SQLITE_PATH",
+        "default_path": "social_states.sqlite3",
+    },
+}
+
+
+def _init_social_state_store(backend):
+    if backend not in SOCIAL_STATE_STORE_CONFIGS:
+        print(f"[WARN] unsupported SOCIAL_STATE_BACKEND={backend}, fallback to memory")
+        backend = "memory"
+    cfg = SOCIAL_STATE_STORE_CONFIGS[backend]
+    if backend == "sqlite":
+        return _SqliteSocialStateStore(os.environ.get(cfg["path_env"]) or cfg["default_path"],
+                                       SOCIAL_STATE_TTL_SECONDS)
+    return _MemorySocialStateStore(SOCIAL_STATE_TTL_SECONDS)
+
+
+SOCIAL_STATE_STORE = _init_social_state_store(SOCIAL_STATE_BACKEND)
 
 
 def _create_social_state(provider, app_redirect_uri, platform):
-    _cleanup_social_states()
     state = secrets.token_urlsafe(24)
-    SOCIAL_STATE_STORE[state] = {
+    SOCIAL_STATE_STORE.put(state, {
         "provider": provider,
         "app_redirect_uri": app_redirect_uri,
         "platform": platform or "",
         "created_at": time.time(),
         "callback_received": False,
         "auth_code": None,
-    }
+    })
     return state
 
 
 def _get_social_state(state):
+    """state 정보의 복사본 (만료됐거나 없으면 None). 바꾼 내용은 SOCIAL_STATE_STORE.put 으로 저장"""
     if not state:
         return None
-    _cleanup_social_states()
     return SOCIAL_STATE_STORE.get(str(state).strip())
 
 
@@ -733,6 +1957,7 @@ def _social_callback(provider):
     state_info["callback_received"] = True
     state_info["auth_code"] = code
     state_info["callback_at"] = time.time()
+    SOCIAL_STATE_STORE.put(state, state_info)
 
     ok_redirect = _merge_query(app_redirect_uri, {
         "provider": provider,
@@ -784,7 +2009,7 @@ def _social_exchange(provider):
     except Exception as e:
         return jsonify({"success": False, "message": f"social exchange failed: {e}"}), 500
 
-    SOCIAL_STATE_STORE.pop(state, None)
+    SOCIAL_STATE_STORE.pop(state)
     return jsonify({
         "success": True,
         "customToken": custom_token,
@@ -939,21 +2164,158 @@ def _firestore_to_legacy_item(user, doc_id, raw):
     }
 
 
-def _list_items(user, sync_project=None):
+LIST_PAGE_MAX_LIMIT = int(os.environ.get("LIST_PAGE_MAX_LIMIT", "1000"))
+
+
+def _encode_list_cursor(date_value, item_id):
+    raw = json.dumps({"d": date_value, "i": item_id}, ensure_ascii=False).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii").rstrip("=")
+
+
+def _decode_list_cursor(cursor, firestore=False):
+    """
+    잘못된 커서면 ValueError. 반환: (date, id)
+    - firestore=True: date 는 시간대가 있는 ISO 시각(datetime 으로 변환해 반환), id 는 문서 id 문자열
+    - 로컬 저장소: date 는 문자열, id 는 정수 (옛 data.json 의 정수가 아닌 id 는 문자열)
+    다른 백엔드가 발급한 커서도 여기서 걸러져 400 이 됨
+    """
+    text = str(cursor or "").strip()
+    pad = (-len(text)) % 4
+    try:
+        parsed = json.loads(base64.urlsafe_b64decode(text + "=" * pad).decode("utf-8"))
+    except Exception:
+        raise ValueError("invalid cursor")
+    if not isinstance(parsed, dict) or not isinstance(parsed.get("d"), str):
+        raise ValueError("invalid cursor")
+    date_value, item_id = parsed["d"], parsed.get("i")
+    if firestore:
+        if not isinstance(item_id, str) or not item_id:
+            raise ValueError("invalid cursor")
+        try:
+            date_value = datetime.fromisoformat(date_value)
+        except ValueError:
+            raise ValueError("invalid cursor")
+        if date_value.tzinfo is None:
+            raise ValueError("invalid cursor")
+    elif not isinstance(item_id, (int, str)) or isinstance(item_id, bool):
+        raise ValueError("invalid cursor")
+    return date_value, item_id
+
+
+def _normalize_date_param(value):
+    """from/to 파라미터를 YYYY-MM-DD 로 정규화 (형식이 틀리면 ValueError)"""
+    text = str(value or "").strip()
+    if not text:
+        return None
+    for fmt in ("%Y-%m-%d", "%Y.%m.%d", "%Y/%m/%d"):
+        try:
+            return datetime.strptime(text[:10], fmt).strftime("%Y-%m-%d")
+        except Exception:
+            continue
+    raise ValueError(f"invalid date: {text}")
+
+
+def _fs_where(query, field, op, value):
+    if FieldFilter is not None:
+        return query.where(filter=FieldFilter(field, op, value))
+    return query.where(field, op, value)
+
+
+def _list_items_page(user, sync_project=None, limit=None, cursor=None, date_from=None, date_to=None):
+    """
+    날짜(동일 날짜는 id) 순 페이지 조회. 반환: (items, next_cursor)
+    - limit=None 이면 조건에 맞는 전체를 반환 (next_cursor 는 None)
+    - cursor 는 직전 응답의 next_cursor (백엔드마다 내용이 다른 불투명 문자열)
+    - date_from / date_to 는 YYYY-MM-DD (양 끝 포함)
+    """
     user_key = _normalize_user_key(user)
-    if _is_firestore_enabled(sync_project):
+    firestore_enabled = _is_firestore_enabled(sync_project)
+    after = _decode_list_cursor(cursor, firestore=firestore_enabled) if cursor else None
+
+    if firestore_enabled:
         entries = _entries_ref(user_key, sync_project=sync_project)
         if entries is None:
-            return []
-        docs = entries.stream()
-        items = []
-        for doc in docs:
-            items.append(_firestore_to_legacy_item(user_key, doc.id, doc.to_dict()))
-        items.sort(key=lambda x: x.get("date", ""))
-        return items
+            return [], None
+        # order_by("date") 는 date 필드가 아예 없는 문서를 결과에서 뺌.
+        # 이 서버는 항상 date 를 쓰므로 date 없이 직접 쓰인 문서만 목록에 나오지 않음
+        query = entries
+        if date_from:
+            query = _fs_where(query, "date", ">=", _parse_date_for_firestore(date_from))
+        if date_to:
+            query = _fs_where(query, "date", "<", _parse_date_for_firestore(date_to) + timedelta(days=1))
+        query = query.order_by("date").order_by("__name__")
+        if after is not None:
+            query = query.start_after({"date": after[0], "__name__": after[1]})
+        if limit is not None:
+            query = query.limit(limit + 1)
+        docs = list(query.stream())
+        next_cursor = None
+        if limit is not None and len(docs) > limit:
+            docs = docs[:limit]
+            last_date = docs[-1].get("date")
+            next_cursor = _encode_list_cursor(last_date.isoformat(), docs[-1].id)
+        items = [_firestore_to_legacy_item(user_key, doc.id, doc.to_dict()) for doc in docs]
+        return items, next_cursor
+
+    items, has_more = LOCAL_STORE.list_page(
+        user_key, date_from=date_from, date_to=date_to, after=after, limit=limit
+    )
+    next_cursor = None
+    if has_more and items:
+        # 저장소가 정렬하는 키와 같은 모양으로: 날짜가 없으면 "", id 는 정수로 바꿀 수 있으면 정수
+        # (옛 data.json 의 정수가 아닌 id 는 _JournalStore._sort_key 처럼 문자열로)
+        item_id = _JournalStore._id_key(items[-1].get("id"))
+        next_cursor = _encode_list_cursor(str(items[-1].get("date") or ""),
+                                          item_id if isinstance(item_id, int) else str(item_id))
+    return items, next_cursor
+
+
+def _list_items(user, sync_project=None):
+    return _list_items_page(user, sync_project=sync_project)[0]
+
+
+LIST_STREAM_PAGE_SIZE = int(os.environ.get("LIST_STREAM_PAGE_SIZE", "500"))
 
-    data = load_data()
-    return [d for d in data if d.get("user", "guest") == user_key]
+
+def _iter_items(user, sync_project=None, cursor=None, date_from=None, date_to=None,
+                page_size=LIST_STREAM_PAGE_SIZE):
+    """페이지 단위로 가져오면서 한 건씩 yield (전체를 메모리에 올리지 않음)"""
+    while True:
+        items, cursor = _list_items_page(
+            user, sync_project=sync_project, limit=page_size, cursor=cursor,
+            date_from=date_from, date_to=date_to,
+        )
+        for item in items:
+            yield item
+        if not cursor:
+            return
+
+
+def _stream_items_json(items_iter, chunk_size=200):
+    """{"success": true, "items": [...], "next_cursor": null} 모양을 조각조각 생성"""
+    yield '{"success": true, "items": ['
+    first = True
+    buf = []
+    for item in items_iter:
+        buf.append(json.dumps(item, ensure_ascii=False))
+        if len(buf) >= chunk_size:
+            yield ("" if first else ",") + ",".join(buf)
+            first = False
+            buf = []
+    if buf:
+        yield ("" if first else ",") + ",".join(buf)
+    yield '], "next_cursor": null}'
+
+
+def _stream_items_ndjson(items_iter, chunk_size=200):
+    buf = []
+    for item in items_iter:
+        buf.append(json.dumps(item, ensure_ascii=False) + "\n")
+        if len(buf) >= chunk_size:
+            yield "".join(buf)
+            buf = []
+    if buf:
+        yield "".join(buf)
 
 
 def _add_item(user, item, sync_project=None):
@@ -967,39 +2329,87 @@ def _add_item(user, item, sync_project=None):
         ref.set(payload)
         return _firestore_to_legacy_item(user_key, ref.id, payload)
 
-    data = load_data()
-    new_id = get_next_id(data)
-    new_item = dict(item)
-    new_item["id"] = new_id
-    new_item["user"] = user_key
-    data.append(new_item)
-    save_data(data)
-    return new_item
+    return LOCAL_STORE.add(user_key, item)
+
+
+# Firestore 일괄 쓰기: 한 배치 최대 500건, 동시 커밋 수 / 재시도 횟수는 환경변수로 조정
+FIRESTORE_BATCH_LIMIT = 500
+FIRESTORE_BULK_CONCURRENCY = int(os.environ.get("FIRESTORE_BULK_CONCURRENCY", "4"))
+FIRESTORE_BULK_MAX_RETRIES = int(os.environ.get("FIRESTORE_BULK_MAX_RETRIES", "3"))
+
+_TRANSIENT_FIRESTORE_ERRORS = (
+    "ServiceUnavailable", "DeadlineExceeded", "Aborted", "InternalServerError",
+    "TooManyRequests", "ResourceExhausted", "GatewayTimeout", "RetryError",
+)
+
+
+def _is_transient_firestore_error(exc):
+    if type(exc).__name__ in _TRANSIENT_FIRESTORE_ERRORS:
+        return True
+    msg = str(exc or "").lower()
+    return "unavailable" in msg or "deadline" in msg or "timed out" in msg
+
+
+def _commit_firestore_batches(client, ops, apply_op):
+    """
+    ops 를 FIRESTORE_BATCH_LIMIT 단위 배치로 나눠 최대 FIRESTORE_BULK_CONCURRENCY 개씩 동시에 커밋.
+    apply_op(batch, op) 가 배치에 쓰기 1건을 추가. 일시적 오류는 배치 단위로 재시도.
+    반환: (성공 건수, 실패 건수, 오류 메시지 목록)
+    """
+    chunks = [ops[i:i + FIRESTORE_BATCH_LIMIT] for i in range(0, len(ops), FIRESTORE_BATCH_LIMIT)]
+    if not chunks:
+        return 0, 0, []
+
+    def commit_chunk(chunk):
+        attempt = 0
+        while True:
+            try:
+                batch = client.batch()
+                for op in chunk:
+                    apply_op(batch, op)
+                batch.commit()
+                return len(chunk), None
+            except Exception as e:
+                attempt += 1
+                if attempt > FIRESTORE_BULK_MAX_RETRIES or not _is_transient_firestore_error(e):
+                    return 0, str(e)
+                time.sleep(min(0.2 * (2 ** attempt), 5.0))
+
+    written = 0
+    failed = 0
+    errors = []
+    workers = max(1, min(FIRESTORE_BULK_CONCURRENCY, len(chunks)))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for chunk, (ok, err) in zip(chunks, pool.map(commit_chunk, chunks)):
+            written += ok
+            if err is not None:
+                failed += len(chunk)
+                errors.append(err)
+    return written, failed, errors
 
 
 def _add_items_bulk(user, items, sync_project=None):
+    """여러 건 추가. 실제로 저장된 건수를 반환 (Firestore 배치 일부 실패 시 len(items) 보다 작음)"""
     user_key = _normalize_user_key(user)
     if not items:
         return 0
 
     if _is_firestore_enabled(sync_project):
+        client = _selected_firestore_client(sync_project)
         entries = _entries_ref(user_key, sync_project=sync_project)
         if entries is None:
             return 0
-        for item in items:
-            payload = _legacy_to_firestore_payload(user_key, item)
-            entries.document().set(payload)
-        return len(items)
-
-    data = load_data()
-    next_id = get_next_id(data)
-    for item in items:
-        new_item = dict(item)
-        new_item["id"] = next_id
-        new_item["user"] = user_key
-        data.append(new_item)
-        next_id += 1
-    save_data(data)
+        # 문서 ref 를 미리 만들어 두면 배치 재시도가 같은 문서에 set 하므로 중복이 생기지 않음
+        ops = [(entries.document(), _legacy_to_firestore_payload(user_key, item)) for item in items]
+        written, failed, errors = _commit_firestore_batches(
+            client, ops, lambda batch, op: batch.set(op[0], op[1])
+        )
+        if failed:
+            print(f"[WARN] Firestore bulk add partially failed ({user_key}): "
+                  f"written={written} failed={failed} errors={errors[:3]}")
+        return written
+
+    LOCAL_STORE.add_bulk(user_key, items)
     return len(items)
 
 
@@ -1012,11 +2422,15 @@ def _delete_item(user, item_id, sync_project=None):
         entries = _entries_ref(user_key, sync_project=sync_project)
         if entries is None:
             return False
+        client = _selected_firestore_client(sync_project)
         doc_ref = entries.document(target_id)
-        doc = doc_ref.get()
-        if not doc.exists:
-            return False
-        doc_ref.delete()
+        # exists=True 전제조건: 존재 확인과 삭제를 한 번의 요청으로 (없으면 NotFound)
+        try:
+            doc_ref.delete(option=client.write_option(exists=True))
+        except Exception as e:
+            if _is_firestore_not_found(e):
+                return False
+            raise
         return True
 
     try:
@@ -1024,60 +2438,403 @@ def _delete_item(user, item_id, sync_project=None):
     except Exception:
         return False
 
-    data = load_data()
-    new_data = []
-    deleted = False
-    for item in data:
-        try:
-            item_int_id = int(item.get("id", 0))
-        except Exception:
-            item_int_id = 0
+    return LOCAL_STORE.delete(user_key, target_id)
 
-        if (not deleted
-                and item_int_id == target_id
-                and item.get("user", "guest") == user_key):
-            deleted = True
-            continue
-        new_data.append(item)
 
-    if deleted:
-        save_data(new_data)
-    return deleted
+# 한 번에 가져오는 삭제 대상 문서 ref 수 (배치 여러 개를 동시에 커밋할 수 있는 양)
+FIRESTORE_DELETE_PAGE_SIZE = FIRESTORE_BATCH_LIMIT * max(1, FIRESTORE_BULK_CONCURRENCY)
+
+
+def _delete_firestore_collection(client, collection_ref, progress=None):
+    """
+    문서 id 만 투영해 ref 를 페이지 단위로 가져와 배치 삭제
+    (select([]) 는 빈 투영이 아니라 전체 필드로 취급되므로 __name__ 만 고름).
+    중간에 끊겨도 다시 호출하면 남은 문서부터 이어서 지움 (삭제는 멱등).
+    반환: (삭제 건수, 실패 건수)
+    """
+    deleted = 0
+    failed = 0
+    cursor = None
+    while True:
+        query = collection_ref.select([admin_firestore.FieldPath.document_id()]).limit(FIRESTORE_DELETE_PAGE_SIZE)
+        if cursor is not None:
+            query = query.start_after(cursor)
+        docs = list(query.stream())
+        if not docs:
+            break
+        ok, bad, errors = _commit_firestore_batches(
+            client, [doc.reference for doc in docs], lambda batch, ref: batch.delete(ref)
+        )
+        deleted += ok
+        failed += bad
+        if errors:
+            print(f"[WARN] Firestore paged delete failed for some batches: {errors[:3]}")
+        if progress is not None:
+            progress(deleted, failed)
+        cursor = docs[-1]
+    return deleted, failed
 
 
-def _clear_items_for_user(user, sync_project=None):
+def _clear_items_for_user(user, sync_project=None, progress=None):
     user_key = _normalize_user_key(user)
     if _is_firestore_enabled(sync_project):
         entries = _entries_ref(user_key, sync_project=sync_project)
         if entries is None:
-            return
-        docs = list(entries.stream())
-        if not docs:
-            return
-        for doc in docs:
-            doc.reference.delete()
-        return
+            return 0
+        client = _selected_firestore_client(sync_project)
+        deleted, failed = _delete_firestore_collection(client, entries, progress=progress)
+        _invalidate_admin_user_list()
+        if failed:
+            raise RuntimeError(f"{failed} entries could not be deleted")
+        return deleted
 
-    data = load_data()
-    new_data = [d for d in data if d.get("user", "guest") != user_key]
-    save_data(new_data)
+    return LOCAL_STORE.clear(user_key)
 
 
-def _list_all_users_for_admin(sync_project=None):
-    names = set(load_users().keys())
+# ------------------ 월/분류별 합계 ------------------
+# 로컬 저장소는 (월, 대분류, 소분류) 합계를 add/delete/clear 안에서 함께 갱신해 두고 그 값을 읽음.
+# Firestore 는 앱연동(sync_uid) 모드에서 모바일 앱이 내역을 직접 쓰므로 서버가 합계를 맞춰 둘 수 없음
+# → 요약 때마다 합계에 필요한 필드만 (월 지정 시 그 달 범위만) 읽어 모음
+def _next_month(month):
+    """'YYYY-MM' 의 다음 달 'YYYY-MM'"""
+    year, mon = int(month[:4]), int(month[5:7])
+    return f"{year + mon // 12:04d}-{mon % 12 + 1:02d}"
 
-    client = _selected_firestore_client(sync_project)
-    if client is not None:
-        for doc in client.collection("accountBooks").stream():
-            names.add(doc.id)
-    else:
-        data = load_data()
-        for item in data:
-            names.add(item.get("user", "guest"))
 
-    if "김준영" in names:
+def _firestore_rollup_rows(user_key, sync_project=None, month=None):
+    entries = _entries_ref(user_key, sync_project=sync_project)
+    if entries is None:
+        return []
+    query = entries
+    if month:
+        query = _fs_where(query, "date", ">=", _parse_date_for_firestore(f"{month}-01"))
+        query = _fs_where(query, "date", "<", _parse_date_for_firestore(f"{_next_month(month)}-01"))
+    totals = {}
+    for doc in query.select(["type", "amount", "category", "date"]).stream():
+        item = _firestore_to_legacy_item(user_key, doc.id, doc.to_dict())
+        total = totals.setdefault(_rollup_key(item), [0.0, 0])
+        total[0] += _summary_amount(item.get("amount"))
+        total[1] += 1
+    return [(m, main, sub, amount, count) for (m, main, sub), (amount, count) in totals.items()]
+
+
+def _load_rollups(user, sync_project=None, month=None):
+    """(월, 대분류, 소분류, 금액 합, 건수) 목록. month(YYYY-MM) 를 주면 그 달만"""
+    user_key = _normalize_user_key(user)
+    if _is_firestore_enabled(sync_project):
+        return _firestore_rollup_rows(user_key, sync_project, month)
+    return LOCAL_STORE.rollups(user_key, month)
+
+
+@app.cli.command("rebuild-rollups")
+@click.option("--user", default=None, help="이 사용자만 다시 집계 (없으면 전체)")
+def rebuild_rollups_command(user):
+    """로컬 저장소(journal/sqlite)의 월/분류별 합계를 내역에서 다시 만듦 (어긋났을 때 복구)"""
+    count = LOCAL_STORE.rebuild_rollups(None if user is None else _normalize_user_key(user))
+    click.echo(f"rebuilt rollups for {count} user(s)")
+
+
+# ------------------ 중복 내역 지문 ------------------
+# Firestore 는 앱연동(sync_uid) 모드에서 모바일 앱이 내역을 직접 쓰고 지우므로 서버가 지문 건수를
+# 따로 저장해 두면 어긋남 → 월/분류별 합계처럼 조회할 때마다 내역에서 바로 셈
+def _firestore_fingerprint_counts(user_key, fingerprints, sync_project=None):
+    """지문들의 날짜 범위(가장 이른 날 ~ 가장 늦은 날)의 내역만, 지문에 필요한 필드만 읽어 건수를 셈"""
+    counts = {fp: 0 for fp in fingerprints}
+    entries = _entries_ref(user_key, sync_project=sync_project)
+    if entries is None or not counts:
+        return counts
+    # 지문의 날짜는 _stored_fingerprint 가 저장 모양으로 왕복시킨 'YYYY-MM-DD'
+    dates = sorted(fp[0] for fp in counts)
+    query = _fs_where(entries, "date", ">=", _parse_date_for_firestore(dates[0]))
+    query = _fs_where(query, "date", "<", _parse_date_for_firestore(dates[-1]) + timedelta(days=1))
+    for doc in query.select(["type", "amount", "memo", "date"]).stream():
+        fp = _entry_fingerprint(_firestore_to_legacy_item(user_key, doc.id, doc.to_dict()))
+        if fp in counts:
+            counts[fp] += 1
+    return counts
+
+
+def _stored_fingerprint(user_key, item, sync_project=None):
+    """저장소에 들어간 뒤의 모양 기준 지문 (Firestore 는 날짜/대분류가 변환되므로 왕복시켜 계산)"""
+    if _is_firestore_enabled(sync_project):
+        return _entry_fingerprint(
+            _firestore_to_legacy_item(user_key, "", _legacy_to_firestore_payload(user_key, item))
+        )
+    return _entry_fingerprint(item)
+
+
+def _existing_fingerprint_counts(user, fingerprints, sync_project=None):
+    """지문별로 이미 저장된 건수 {지문: 건수}"""
+    user_key = _normalize_user_key(user)
+    if _is_firestore_enabled(sync_project):
+        return _firestore_fingerprint_counts(user_key, fingerprints, sync_project)
+    return LOCAL_STORE.fingerprint_counts(user_key, fingerprints)
+
+
+def _make_duplicate_filter(user, sync_project=None):
+    """
+    가져오기 1회 동안 쓰는 중복 필터. filter(items) -> (새 항목, 건너뛴 건수)
+    파일 안에서 같은 지문이 k 번째로 나올 때 기존 저장분에 k 건 이상 있으면 중복으로 봄.
+    (같은 날 같은 금액 결제가 실제로 여러 번 있으면 파일에 있는 만큼은 저장됨)
+    """
+    user_key = _normalize_user_key(user)
+    existing = {}  # 이번 가져오기 전의 건수 (처음 나온 지문만 조회)
+    seen = {}
+
+    def filter_items(items):
+        fps = [_stored_fingerprint(user_key, item, sync_project) for item in items]
+        missing = {fp for fp in fps if fp not in existing}
+        if missing:
+            existing.update(_existing_fingerprint_counts(user_key, missing, sync_project))
+        fresh = []
+        for item, fp in zip(items, fps):
+            seen[fp] = seen.get(fp, 0) + 1
+            if seen[fp] > existing.get(fp, 0):
+                fresh.append(item)
+        return fresh, len(items) - len(fresh)
+
+    return filter_items
+
+
+# ------------------ 백그라운드 작업 ------------------
+# 작업 상태는 JOBS_DIR 의 파일로 남겨 다른 gunicorn 워커에서도 조회 가능
+JOBS_DIR = os.environ.get("JOBS_DIR", "jobs")
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "2"))
+JOB_RETENTION_SECONDS = int(os.environ.get("JOB_RETENTION_SECONDS", "86400"))
+# 실행 중인 워커가 queued/running 작업의 updated_at 을 이 주기로 갱신. 이보다 오래 갱신이 없으면
+# (워커 타임아웃/재시작/강제 종료) 상태 조회에서 failed 로 보여 줌
+JOB_HEARTBEAT_SECONDS = int(os.environ.get("JOB_HEARTBEAT_SECONDS", "15"))
+JOB_STALE_SECONDS = int(os.environ.get("JOB_STALE_SECONDS", "120"))
+_JOB_EXECUTOR = ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="job")
+_JOB_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+# 가져오기 작업이 처리할 업로드 파일을 잠시 두는 곳 (작업이 끝나면 삭제)
+IMPORT_SPOOL_DIR = os.environ.get("IMPORT_SPOOL_DIR", os.path.join(JOBS_DIR, "uploads"))
+
+
+class _JobCancelled(Exception):
+    """작업 도중 취소 요청을 확인했을 때 target 이 던짐"""
+
+
+def _job_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.json")
+
+
+def _job_cancel_path(job_id):
+    return os.path.join(JOBS_DIR, f"{job_id}.cancel")
+
+
+def _request_job_cancel(job_id):
+    """취소 요청은 플래그 파일로 남겨 작업을 실행 중인 다른 워커에서도 보이게 함"""
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    with open(_job_cancel_path(job_id), 'w', encoding='utf-8'):
+        pass
+
+
+def _job_cancel_requested(job_id):
+    return os.path.exists(_job_cancel_path(job_id))
+
+
+# 이 프로세스가 맡은 끝나지 않은 작업 id (heartbeat 대상). 작업 파일 쓰기는 _JOB_SAVE_LOCK 으로 직렬화
+_LIVE_JOB_IDS = set()
+_JOB_SAVE_LOCK = threading.Lock()
+_JOB_HEARTBEAT_PID = None
+
+
+def _save_job(job):
+    os.makedirs(JOBS_DIR, exist_ok=True)
+    with _JOB_SAVE_LOCK:
+        job["updated_at"] = time.time()
+        _atomic_write_json(_job_path(job["id"]), job)
+
+
+def _read_job_file(job_id):
+    try:
+        with open(_job_path(job_id), 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception:
+        return None
+
+
+def _load_job(job_id):
+    job_id = str(job_id or "").strip()
+    if not _JOB_ID_PATTERN.match(job_id):
+        return None
+    job = _read_job_file(job_id)
+    if job is not None and job.get("status") in ("queued", "running"):
+        last_seen = job.get("updated_at") or job.get("created_at") or 0
+        if time.time() - last_seen > JOB_STALE_SECONDS:
+            # 맡은 워커가 사라져 끝났다고 기록할 주체가 없음 → 파일은 그대로 두고 실패로 보고
+            job["status"] = "failed"
+            job["error"] = "작업을 처리하던 서버 프로세스가 중단되어 작업이 끝나지 못했습니다. 다시 시도해 주세요."
+            job["stale"] = True
+    return job
+
+
+def _job_heartbeat_loop():
+    while True:
+        time.sleep(JOB_HEARTBEAT_SECONDS)
+        with _JOB_SAVE_LOCK:
+            for job_id in list(_LIVE_JOB_IDS):
+                # 진행 상황은 작업 스레드가 쓴 파일 내용을 그대로 두고 updated_at 만 갱신
+                job = _read_job_file(job_id)
+                if job is None or job.get("status") not in ("queued", "running"):
+                    continue
+                job["updated_at"] = time.time()
+                try:
+                    _atomic_write_json(_job_path(job_id), job)
+                except OSError:
+                    pass
+
+
+def _reset_jobs_after_fork():
+    """부모 프로세스의 작업은 자식이 맡은 게 아니므로 heartbeat 대상에서 빼고 락을 새로 만듦"""
+    global _JOB_SAVE_LOCK
+    _JOB_SAVE_LOCK = threading.Lock()
+    _LIVE_JOB_IDS.clear()
+
+
+if hasattr(os, "register_at_fork"):
+    os.register_at_fork(after_in_child=_reset_jobs_after_fork)
+
+
+def _ensure_job_heartbeat():
+    """프로세스(fork 된 워커 포함)마다 heartbeat 스레드를 한 번만 띄움"""
+    global _JOB_HEARTBEAT_PID
+    if _JOB_HEARTBEAT_PID != os.getpid():
+        _JOB_HEARTBEAT_PID = os.getpid()
+        threading.Thread(target=_job_heartbeat_loop, name="job-heartbeat", daemon=True).start()
+
+
+def _cleanup_old_jobs():
+    now_ts = time.time()
+    for directory in (JOBS_DIR, IMPORT_SPOOL_DIR):
+        if not os.path.isdir(directory):
+            continue
+        for name in os.listdir(directory):
+            path = os.path.join(directory, name)
+            try:
+                if os.path.isfile(path) and now_ts - os.path.getmtime(path) > JOB_RETENTION_SECONDS:
+                    os.remove(path)
+            except OSError:
+                pass
+
+
+def _submit_job(kind, target, **params):
+    """
+    target(job) 을 작업 스레드에서 실행하고 job dict 를 바로 반환.
+    target 은 job 의 진행 상황 필드를 바꾼 뒤 _save_job(job) 으로 남길 수 있고,
+    dict 를 반환하면 완료 시 job 에 합쳐짐. _JobCancelled 를 던지면 cancelled 로 끝남.
+    """
+    _cleanup_old_jobs()
+    job = {
+        "id": secrets.token_urlsafe(12),
+        "kind": kind,
+        "status": "queued",
+        "created_at": time.time(),
+        "error": None,
+    }
+    job.update(params)
+    _save_job(job)
+    _LIVE_JOB_IDS.add(job["id"])
+    _ensure_job_heartbeat()
+
+    def run():
+        job["status"] = "running"
+        job["started_at"] = time.time()
+        _save_job(job)
+        try:
+            if _job_cancel_requested(job["id"]):
+                raise _JobCancelled()
+            result = target(job) or {}
+            job.update(result)
+            job["status"] = "done"
+        except _JobCancelled:
+            job["status"] = "cancelled"
+        except Exception as e:
+            job["status"] = "failed"
+            job["error"] = str(e)
+            print(f"[WARN] background job failed ({kind} {job['id']}): {e}")
+        job["finished_at"] = time.time()
+        _save_job(job)
+        _LIVE_JOB_IDS.discard(job["id"])
+        try:
+            os.remove(_job_cancel_path(job["id"]))
+        except OSError:
+            pass
+
+    queued = dict(job)
+    _JOB_EXECUTOR.submit(run)
+    return queued
+
+
+def _submit_clear_job(user, sync_project):
+    """사용자 내역 전체 삭제를 백그라운드 작업으로 실행"""
+    def target(job):
+        def progress(deleted, failed):
+            job["deleted"] = deleted
+            job["failed"] = failed
+            _save_job(job)
+        deleted = _clear_items_for_user(user, sync_project=sync_project, progress=progress)
+        return {"deleted": deleted}
+
+    return _submit_job("clear_entries", target, user=_normalize_user_key(user), deleted=0, failed=0)
+
+
+@app.route('/api/jobs/status', methods=['GET'])
+def api_job_status():
+    job = _load_job(request.args.get('job_id'))
+    if job is None:
+        return jsonify({"success": False, "message": "작업을 찾을 수 없습니다."}), 404
+    return jsonify({"success": True, "job": job})
+
+
+# 관리자 화면 사용자 목록은 대상별로 정렬된 이름 목록을 잠시 캐시 (가입/삭제 시 바로 버림).
+# 가입 없이 내역만 쓴 사용자는 TTL 이 지나야 목록에 나타남
+ADMIN_USER_LIST_TTL_SECONDS = int(os.environ.get("ADMIN_USER_LIST_TTL_SECONDS", "60"))
+ADMIN_USER_PAGE_MAX_LIMIT = int(os.environ.get("ADMIN_USER_PAGE_MAX_LIMIT", "1000"))
+_ADMIN_USER_LIST_CACHE = {}
+_ADMIN_USER_LIST_LOCK = threading.Lock()
+
+
+def _invalidate_admin_user_list():
+    with _ADMIN_USER_LIST_LOCK:
+        _ADMIN_USER_LIST_CACHE.clear()
+
+
+def _list_all_users_for_admin(sync_project=None):
+    client = _selected_firestore_client(sync_project)
+    cache_key = _resolve_sync_target(sync_project) if client is not None else None
+    with _ADMIN_USER_LIST_LOCK:
+        cached = _ADMIN_USER_LIST_CACHE.get(cache_key)
+        if cached is not None and time.time() - cached["built_at"] < ADMIN_USER_LIST_TTL_SECONDS:
+            return cached["names"]
+
+    names = set(list_user_names())
+    if client is not None:
+        # 필드 없이 문서 id 만 (내역 하위 컬렉션만 있고 본 문서가 없는 사용자도 포함)
+        for ref in client.collection("accountBooks").list_documents(page_size=FIRESTORE_DELETE_PAGE_SIZE):
+            names.add(ref.id)
+    else:
+        names.update(LOCAL_STORE.all_users())
+
+    if "김준영" in names:
         names.add("admin")
-    return sorted(names)
+    names = sorted(names)
+    with _ADMIN_USER_LIST_LOCK:
+        _ADMIN_USER_LIST_CACHE[cache_key] = {"names": names, "built_at": time.time()}
+    return names
+
+
+def _admin_user_page(names, prefix=None, after=None, limit=None):
+    """정렬된 names 에서 prefix 로 시작하고 after 보다 뒤인 이름을 limit 개. 반환: (이름들, 다음 페이지 존재 여부)"""
+    lo, hi = 0, len(names)
+    if prefix:
+        lo = bisect.bisect_left(names, prefix)
+        hi = bisect.bisect_left(names, prefix + "\U0010ffff")
+    if after is not None:
+        lo = max(lo, bisect.bisect_right(names, after))
+    end = hi if limit is None else min(hi, lo + limit)
+    return names[lo:end], end < hi
 
 
 @app.route('/api/sync_status', methods=['GET'])
@@ -1107,6 +2864,7 @@ def api_sync_status():
         "service_account_path_present": bool(os.environ.get(cfg["service_path_env"])),
         "sync_uid": user_key or None,
         "firestore_init_error": FS_INIT_ERROR,
+        "firestore_init_timings": {target: dict(t) for target, t in list(FS_INIT_TIMINGS.items())},
         # Safe env diagnostics (never include secret).
         "service_account_json_len": len(raw_env),
         "service_account_json_first_char": raw_env_stripped[:1] if raw_env_stripped else None,
@@ -1138,15 +2896,6 @@ def _find_col(possible_names, columns):
     return None
 
 
-def _normalize_main_category(value, default_main):
-    s = str(value).strip()
-    if s in ('수입', '입금', 'Income', 'income'):
-        return '수입'
-    if s in ('지출', '출금', 'Expense', 'expense', '지 급'):
-        return '지출'
-    return default_main
-
-
 def _parse_amount(value):
     if value is None:
         return None
@@ -1160,42 +2909,207 @@ def _parse_amount(value):
         return None
 
 
-def parse_kb_kukmin_block(raw_bytes):
+# 가져오기 컬럼 후보 (앞에 있을수록 우선)
+IMPORT_DATE_COLUMNS = ['날짜', '일자', '거래일자', '거래일', '거래일시', '일시', 'date', 'Date']
+IMPORT_AMOUNT_COLUMNS = ['금액', '거래금액', '금 액', '거래금액(원)', '금액(원)', 'amount', 'Amount']
+IMPORT_CREDIT_COLUMNS = ['입금', '입금액', '입금(원)', '입금금액', '입금금액(원)']
+IMPORT_DEBIT_COLUMNS = ['출금', '출금액', '출금(원)', '출금금액', '출금금액(원)']
+IMPORT_MEMO_COLUMNS = ['내용', '적요', '메모', '설명', 'memo', 'Memo']
+IMPORT_MAIN_COLUMNS = ['대분류', '구분', '수입지출', '유형', 'type', 'Type']
+IMPORT_SUB_COLUMNS = ['소분류', '카테고리', '분류', 'category', 'Category']
+
+_INCOME_LABELS = ['수입', '입금', 'Income', 'income']
+_EXPENSE_LABELS = ['지출', '출금', 'Expense', 'expense', '지 급']
+
+
+def _text_column(series):
+    """각 값에 str() 을 적용한 것과 같은 문자열 컬럼 (NaN → 'nan', None → 'None')"""
+    return series.astype(object).map(str)
+
+
+def _parse_amount_column(series):
     """
-    국민은행 일부 양식(블록 형식) 자동 파싱 시도
+    _parse_amount 의 컬럼 버전. 반환: (float ndarray, 유효 여부 bool ndarray)
+    쉼표/'원' 제거 후 pd.to_numeric 으로 한 번에 변환하고,
+    변환되지 않은 드문 값('nan', '1_000' 등)만 _parse_amount 로 다시 확인.
     """
-    text = raw_bytes.decode('utf-8', errors='ignore')
-    lines = [ln.strip().strip('"') for ln in text.splitlines()]
+    cleaned = _text_column(series).str.replace(',', '', regex=False).str.replace('원', '', regex=False).str.strip()
+    values = pd.to_numeric(cleaned, errors='coerce').to_numpy(dtype=float, copy=True)
+    blank = cleaned.isin(['', '-']).to_numpy()
+    valid = ~np.isnan(values)
+    # to_numeric 은 마지막 자리 반올림이 float() 과 다를 수 있어 값은 float() 로 다시 변환
+    texts = cleaned.to_numpy(dtype=object)
+    try:
+        values[valid] = texts[valid].astype(float)
+    except (TypeError, ValueError):
+        for pos in np.flatnonzero(valid):
+            parsed = _parse_amount(texts[pos])
+            values[pos] = np.nan if parsed is None else parsed
+            valid[pos] = parsed is not None
+    retry = np.flatnonzero(~valid & ~blank)
+    for pos in retry:
+        parsed = _parse_amount(texts[pos])
+        if parsed is not None:
+            values[pos] = parsed
+            valid[pos] = True
+    return values, valid
+
+
+def _has_import_columns(columns):
+    """가져오기에 꼭 필요한 컬럼('날짜' 류 + '금액/입금/출금' 류)이 있는지"""
+    return bool(_find_col(IMPORT_DATE_COLUMNS, columns)) and any(
+        _find_col(names, columns) for names in (IMPORT_AMOUNT_COLUMNS, IMPORT_CREDIT_COLUMNS, IMPORT_DEBIT_COLUMNS)
+    )
 
-    date_pattern = re.compile(r'^\s*\d{4}\.\d{2}\.\d{2}')
 
-    def detect_start(lines_):
-        for i in range(len(lines_) - 3):
-            if date_pattern.match(lines_[i]):
-                nums = re.findall(r'[\d,]+', lines_[i + 1])
-                if len(nums) >= 2:
-                    return i
-        return None
+def _normalize_import_frame(df, default_main, default_sub):
+    """
+    DataFrame(CSV/엑셀 공용)을 가계부 항목 리스트로 변환. 행 단위 반복 없이 컬럼 연산으로 처리.
+    반환: (items, None) / 필요한 컬럼이 없으면 (None, 오류 메시지)
+    """
+    cols = list(df.columns)
+    date_col = _find_col(IMPORT_DATE_COLUMNS, cols)
+    amount_col = _find_col(IMPORT_AMOUNT_COLUMNS, cols)
+    credit_col = _find_col(IMPORT_CREDIT_COLUMNS, cols)
+    debit_col = _find_col(IMPORT_DEBIT_COLUMNS, cols)
+    memo_col = _find_col(IMPORT_MEMO_COLUMNS, cols)
+    main_col = _find_col(IMPORT_MAIN_COLUMNS, cols)
+    sub_col = _find_col(IMPORT_SUB_COLUMNS, cols)
+
+    if not _has_import_columns(cols):
+        return None, "파일에 '날짜' 또는 '일시'와 '금액/입금/출금'에 해당하는 컬럼이 필요합니다."
+
+    n = len(df)
+    if n == 0:
+        return [], None
+
+    date_raw = df[date_col]
+    dates = _text_column(date_raw).str.strip()
+    keep = (~date_raw.isna() & (dates != '')).to_numpy(copy=True)
+
+    if memo_col:
+        memo_raw = df[memo_col]
+        memos = _text_column(memo_raw).str.strip().where(~memo_raw.isna(), '')
+    else:
+        memos = pd.Series([''] * n, index=df.index, dtype=object)
+
+    if amount_col:
+        # ① 단일 금액 컬럼이 있는 경우
+        amounts, valid = _parse_amount_column(df[amount_col])
+        keep &= valid
+        if main_col:
+            main_text = _text_column(df[main_col]).str.strip()
+            mains = np.where(main_text.isin(_INCOME_LABELS), '수입',
+                             np.where(main_text.isin(_EXPENSE_LABELS), '지출', default_main))
+        else:
+            mains = np.full(n, default_main, dtype=object)
+    else:
+        # ② 입금/출금 분리된 경우
+        credit = np.zeros(n, dtype=float)
+        debit = np.zeros(n, dtype=float)
+        if credit_col:
+            credit, credit_valid = _parse_amount_column(df[credit_col])
+            credit = np.where(credit_valid, credit, 0.0)
+        if debit_col:
+            debit, debit_valid = _parse_amount_column(df[debit_col])
+            debit = np.where(debit_valid, debit, 0.0)
+        keep &= ~((credit == 0) & (debit == 0))
+        only_credit = (credit > 0) & (debit == 0)
+        only_debit = (debit > 0) & (credit == 0)
+        debit_wins = ~only_credit & (only_debit | (np.abs(debit) >= np.abs(credit)))
+        amounts = np.where(debit_wins, debit, credit).astype(object)
+        # 기존 로직(`credit or 0`)처럼 0 은 정수 0
+        amounts[np.where(debit_wins, debit, credit) == 0] = 0
+        mains = np.where(debit_wins, '지출', '수입')
+
+    if sub_col:
+        sub_raw = df[sub_col]
+        sub_text = _text_column(sub_raw).str.strip()
+        subs = sub_text.where(~sub_raw.isna() & (sub_text != ''), default_sub)
+    else:
+        subs = pd.Series([default_sub] * n, index=df.index, dtype=object)
+
+    rows = np.flatnonzero(keep)
+    return [
+        {
+            "date": date_str,
+            "amount": amount_val,
+            "memo": memo_val,
+            "main_category": main_category,
+            "sub_category": sub_category,
+        }
+        for date_str, amount_val, memo_val, main_category, sub_category in zip(
+            dates.to_numpy()[rows].tolist(),
+            amounts[rows].tolist(),
+            memos.to_numpy()[rows].tolist(),
+            np.asarray(mains)[rows].tolist(),
+            subs.to_numpy()[rows].tolist(),
+        )
+    ], None
+
 
-    start = detect_start(lines)
+# 국민은행 내역 CSV 공용 패턴 (매 호출마다 컴파일하지 않도록 모듈 수준에 둠)
+_KB_DATE_PATTERN = re.compile(r'^\s*\d{4}\.\d{2}\.\d{2}')
+_KB_DATETIME_PATTERN = re.compile(r'^\s*(\d{4}\.\d{2}\.\d{2})\s+(\d{2}:\d{2}:\d{2})')
+# 숫자로 시작하는 금액 토큰만 (쉼표만 있는 토큰 ',' 을 int('') 로 변환하다 죽던 문제 방지)
+_KB_NUMBER_PATTERN = re.compile(r'\d[\d,]*')
+_KB_DIGIT_PATTERN = re.compile(r'\d')
+_KB_DIGIT_OR_COMMA_PATTERN = re.compile(r'[\d,]')
+
+
+def _kb_numbers(text):
+    return [int(n.replace(',', '')) for n in _KB_NUMBER_PATTERN.findall(text)]
+
+
+def _kb_lines(raw_bytes):
+    """바이트를 한 번만 디코딩해 정리된 줄 목록으로 변환 (행/블록 파서가 공유)"""
+    text = raw_bytes.decode('utf-8', errors='ignore')
+    return [ln.strip().strip('"') for ln in text.splitlines()]
+
+
+def _classify_kb_export(head):
+    """
+    파일 앞부분만 보고 국민은행 포맷 종류를 추정.
+    반환: 'row'(일시가 한 줄에 있는 행 단위) / 'block'(날짜줄+금액줄 블록) / None(일반 CSV)
+    """
+    text = head.decode('utf-8', errors='ignore')
+    kind = None
+    for line in text.splitlines():
+        line = line.strip().strip('"')
+        # 기존처럼 행 단위 포맷이 우선
+        if _KB_DATETIME_PATTERN.match(line):
+            return 'row'
+        if kind is None and _KB_DATE_PATTERN.match(line):
+            kind = 'block'
+    return kind
+
+
+def _parse_kb_block_lines(lines):
+    """블록 형식: 날짜줄 / 금액·잔액줄 / 시간줄 / 구분줄 이 4줄씩 반복"""
+    start = None
+    for i in range(len(lines) - 3):
+        if _KB_DATE_PATTERN.match(lines[i]) and len(_KB_NUMBER_PATTERN.findall(lines[i + 1])) >= 2:
+            start = i
+            break
     if start is None:
         return None
 
-    records = []
+    items = []
+    prev_bal = None
     i = start
     while i + 2 < len(lines):
         date_line = lines[i]
         info_line = lines[i + 1]
         time_line = lines[i + 2]
 
-        m = date_pattern.match(date_line)
+        m = _KB_DATE_PATTERN.match(date_line)
         if not m:
             break
 
         y, mth, d = date_line[m.start():m.end()].split('.')
         date_str = f"{y}-{mth}-{d}"
 
-        nums = [int(n.replace(',', '')) for n in re.findall(r'[\d,]+', info_line)]
+        nums = _kb_numbers(info_line)
         if len(nums) >= 3:
             amt1, amt2, balance = nums[0], nums[1], nums[2]
         elif len(nums) == 2:
@@ -1203,9 +3117,30 @@ def parse_kb_kukmin_block(raw_bytes):
         else:
             i += 4
             continue
+        i += 4
+
+        # 금액 판단: 첫 건은 입/출금 컬럼, 이후는 잔액 변화량 기준
+        if prev_bal is None:
+            if amt1 and not amt2:
+                amount, main_category = amt1, "지출"
+            elif amt2 and not amt1:
+                amount, main_category = amt2, "수입"
+            else:
+                prev_bal = balance
+                continue
+        else:
+            delta = balance - prev_bal
+            if delta > 0:
+                amount, main_category = delta, "수입"
+            elif delta < 0:
+                amount, main_category = -delta, "지출"
+            else:
+                prev_bal = balance
+                continue
+        prev_bal = balance
 
         base_memo = date_line[m.end():].strip()
-        prefix = re.split(r'\d', info_line, 1)[0].strip()
+        prefix = _KB_DIGIT_PATTERN.split(info_line, 1)[0].strip()
 
         desc_parts = []
         if base_memo:
@@ -1213,144 +3148,90 @@ def parse_kb_kukmin_block(raw_bytes):
         if prefix and prefix not in base_memo:
             desc_parts.append(prefix)
 
-        money_desc = []
         if amt1 and amt2:
-            money_desc.append(f"금액1 {amt1:,}원")
-            money_desc.append(f"금액2 {amt2:,}원")
+            desc_parts.append(f"금액1 {amt1:,}원")
+            desc_parts.append(f"금액2 {amt2:,}원")
         elif amt1:
-            money_desc.append(f"{amt1:,}원")
+            desc_parts.append(f"{amt1:,}원")
         elif amt2:
-            money_desc.append(f"{amt2:,}원")
-
-        money_desc.append(f"잔액 {balance:,}원")
-        desc_parts.extend(money_desc)
+            desc_parts.append(f"{amt2:,}원")
+        desc_parts.append(f"잔액 {balance:,}원")
 
         time_clean = time_line.strip()
         if time_clean:
             desc_parts.append(f"시간 {time_clean}")
 
-        memo = " / ".join(desc_parts) if desc_parts else "KB 거래"
-
-        records.append({
-            "date": date_str,
-            "amt1": amt1,
-            "amt2": amt2,
-            "balance": balance,
-            "memo": memo,
-        })
-        i += 4
-
-    if not records:
-        return None
-
-    items = []
-    prev_bal = None
-    for r in records:
-        bal = r["balance"]
-        if prev_bal is None:
-            if r["amt1"] and not r["amt2"]:
-                amount = r["amt1"]
-                main_category = "지출"
-            elif r["amt2"] and not r["amt1"]:
-                amount = r["amt2"]
-                main_category = "수입"
-            else:
-                prev_bal = bal
-                continue
-        else:
-            delta = bal - prev_bal
-            if delta > 0:
-                amount = delta
-                main_category = "수입"
-            elif delta < 0:
-                amount = -delta
-                main_category = "지출"
-            else:
-                prev_bal = bal
-                continue
-
-        prev_bal = bal
-        sub_category = "기타수입" if main_category == "수입" else "기타지출"
         items.append({
-            "date": r["date"],
+            "date": date_str,
             "amount": amount,
             "main_category": main_category,
-            "sub_category": sub_category,
-            "memo": r["memo"]
+            "sub_category": "기타수입" if main_category == "수입" else "기타지출",
+            "memo": " / ".join(desc_parts)
         })
 
-    if not items:
-        return None
-    return items
-
-
-def parse_kb_kukmin_row(raw_bytes):
-    """
-    국민은행 '행 단위' 내역 CSV 파싱 시도
-    """
-    text = raw_bytes.decode('utf-8', errors='ignore')
-    lines = [ln.strip().strip('"') for ln in text.splitlines()]
+    return items or None
 
-    dt_pattern = re.compile(r'^\s*(\d{4}\.\d{2}\.\d{2})\s+(\d{2}:\d{2}:\d{2})')
 
+def _parse_kb_row_lines(lines):
+    """행 단위 형식: 'YYYY.MM.DD HH:MM:SS 적요 출금 입금 ...' 한 줄이 한 건"""
     items = []
-    for idx, line in enumerate(lines):
-        m = dt_pattern.match(line)
+    prev_line = ''
+    prev_is_row = False
+    for line in lines:
+        m = _KB_DATETIME_PATTERN.match(line)
         if not m:
+            prev_line, prev_is_row = line, False
             continue
-        date_raw = m.group(1)
-        date_str = date_raw.replace('.', '-')
         tail = line[m.end():].strip()
-
-        nums = [int(n.replace(',', '')) for n in re.findall(r'[\d,]+', tail)]
+        nums = _kb_numbers(tail)
         if len(nums) < 2:
+            prev_line, prev_is_row = line, True
             continue
         amt1, amt2 = nums[0], nums[1]
 
         if amt1 != 0 and amt2 == 0:
-            amount = amt1
-            main_category = '지출'
+            amount, main_category = amt1, '지출'
         elif amt2 != 0 and amt1 == 0:
-            amount = amt2
-            main_category = '수입'
+            amount, main_category = amt2, '수입'
+        elif abs(amt1) >= abs(amt2):
+            amount, main_category = amt1, '지출'
         else:
-            if abs(amt1) >= abs(amt2):
-                amount = amt1
-                main_category = '지출'
-            else:
-                amount = amt2
-                main_category = '수입'
-
-        prev_line = lines[idx - 1].strip() if idx > 0 else ''
-        seg = re.split(r'[\d,]', tail, 1)[0].strip()
+            amount, main_category = amt2, '수입'
 
         parts = []
-        if prev_line and not dt_pattern.match(prev_line) and prev_line not in ('/',):
-            parts.append(prev_line)
-        if seg:
+        prev_clean = prev_line.strip()
+        if prev_clean and not prev_is_row and prev_clean != '/':
+            parts.append(prev_clean)
+        seg = _KB_DIGIT_OR_COMMA_PATTERN.split(tail, 1)[0].strip()
+        if seg and seg not in parts:
             parts.append(seg)
 
-        seen = set()
-        parts_clean = []
-        for p in parts:
-            if p not in seen:
-                seen.add(p)
-                parts_clean.append(p)
-
-        memo = " / ".join(parts_clean) if parts_clean else "KB 거래"
-        sub_category = "기타수입" if main_category == "수입" else "기타지출"
-
         items.append({
-            "date": date_str,
+            "date": m.group(1).replace('.', '-'),
             "amount": amount,
             "main_category": main_category,
-            "sub_category": sub_category,
-            "memo": memo
+            "sub_category": "기타수입" if main_category == "수입" else "기타지출",
+            "memo": " / ".join(parts) if parts else "KB 거래"
         })
+        prev_line, prev_is_row = line, True
 
-    if not items:
-        return None
-    return items
+    return items or None
+
+
+def parse_kb_kukmin(raw_bytes, kind=None):
+    """
+    국민은행 내역 CSV 파싱. 한 번 디코딩한 줄 목록으로 추정한 포맷(kind)을 먼저 시도하고,
+    결과가 없으면 다른 포맷을 시도. 둘 다 아니면 None
+    """
+    lines = _kb_lines(raw_bytes)
+    parsers = [_parse_kb_row_lines, _parse_kb_block_lines]
+    if kind == 'block':
+        parsers.reverse()
+    for parser in parsers:
+        items = parser(lines)
+        if items is not None:
+            return items
+    return None
 
 
 # ------------------ HTML ------------------
@@ -1386,8 +3267,7 @@ def api_user_login():
     if user == 'guest':
         return jsonify({"success": True, "is_admin": False, "is_new": False})
 
-    users = load_users()
-    info = users.get(user)
+    info = get_user(user)
 
     # 등록되지 않은 사용자 → 프론트에서 "새로 만들까요?" 물어보고 /api/user_register 호출
     if not info:
@@ -1416,30 +3296,154 @@ def api_user_register():
     if user in ('guest', 'admin'):
         return jsonify({"success": False, "message": "해당 이름은 사용할 수 없습니다."}), 400
 
-    users = load_users()
-    if user in users:
+    if not LOCAL_STORE.add_user(user, {"password": password, "is_admin": False}):
         return jsonify({"success": False, "message": "이미 존재하는 사용자입니다."}), 400
-
-    users[user] = {"password": password, "is_admin": False}
-    save_users(users)
+    _invalidate_admin_user_list()
     return jsonify({"success": True})
 
 
 @app.route('/api/users_for_admin', methods=['GET'])
 def api_users_for_admin():
-    """관리자 화면에서 조회할 수 있는 사용자 목록"""
+    """
+    관리자 화면에서 조회할 수 있는 사용자 목록.
+    선택 파라미터: prefix(이름 앞부분), limit(페이지 크기), cursor(직전 응답의 next_cursor)
+    limit 이 없으면 전체를 한 번에 반환
+    """
     sync_project = _extract_sync_project_from_request()
-    user_list = _list_all_users_for_admin(sync_project=sync_project)
-    return jsonify({"success": True, "users": user_list})
+    prefix = (request.args.get('prefix') or '').strip() or None
+    try:
+        limit_raw = (request.args.get('limit') or '').strip()
+        limit = None
+        if limit_raw:
+            limit = int(limit_raw)
+            if limit <= 0:
+                raise ValueError("limit must be positive")
+            limit = min(limit, ADMIN_USER_PAGE_MAX_LIMIT)
+        cursor = (request.args.get('cursor') or '').strip()
+        after = _decode_user_cursor(cursor) if cursor else None
+    except ValueError:
+        return jsonify({"success": False, "message": "limit/cursor 값이 올바르지 않습니다."}), 400
+
+    names = _list_all_users_for_admin(sync_project=sync_project)
+    user_list, has_more = _admin_user_page(names, prefix=prefix, after=after, limit=limit)
+    next_cursor = _encode_user_cursor(user_list[-1]) if has_more and user_list else None
+    return jsonify({"success": True, "users": user_list, "next_cursor": next_cursor})
+
+
+def _encode_user_cursor(name):
+    return base64.urlsafe_b64encode(name.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def _decode_user_cursor(cursor):
+    """잘못된 커서면 ValueError"""
+    pad = (-len(cursor)) % 4
+    try:
+        return base64.b64decode(cursor + "=" * pad, altchars=b"-_", validate=True).decode("utf-8")
+    except Exception:
+        raise ValueError("invalid cursor")
 
 
 # ------------------ 가계부 CRUD ------------------
 @app.route('/api/list', methods=['GET'])
 def api_list():
+    """
+    선택 파라미터: limit(페이지 크기), cursor(이전 응답의 next_cursor), from/to(YYYY-MM-DD)
+    limit 이 없으면 전체 내역을 페이지 단위로 읽으면서 스트리밍으로 반환하고,
+    이때 format=ndjson 이면 한 줄에 한 건씩 (application/x-ndjson).
+    """
+    sync_project = _extract_sync_project_from_request()
+    user = request.args.get('user', 'guest')
+    try:
+        limit = request.args.get('limit')
+        limit = int(limit) if limit else None
+        if limit is not None and not (1 <= limit <= LIST_PAGE_MAX_LIMIT):
+            raise ValueError("limit out of range")
+        date_from = _normalize_date_param(request.args.get('from'))
+        date_to = _normalize_date_param(request.args.get('to'))
+        cursor = request.args.get('cursor') or None
+        if cursor:
+            _decode_list_cursor(cursor, firestore=_is_firestore_enabled(sync_project))
+    except ValueError:
+        return jsonify({"success": False, "message": "limit/cursor/from/to 값이 올바르지 않습니다."}), 400
+
+    if limit is None:
+        items_iter = _iter_items(user, sync_project=sync_project, cursor=cursor,
+                                 date_from=date_from, date_to=date_to)
+        if (request.args.get('format') or '').strip().lower() == 'ndjson':
+            return Response(stream_with_context(_stream_items_ndjson(items_iter)),
+                            mimetype='application/x-ndjson')
+        return Response(stream_with_context(_stream_items_json(items_iter)), mimetype='application/json')
+
+    data, next_cursor = _list_items_page(
+        user, sync_project=sync_project, limit=limit, cursor=cursor, date_from=date_from, date_to=date_to
+    )
+    return jsonify({"success": True, "items": data, "next_cursor": next_cursor})
+
+
+_MONTH_PARAM_PATTERN = re.compile(r'^\d{4}-(0[1-9]|1[0-2])$')
+
+
+def _summary_from_rollups(rows, month=None):
+    """
+    (월, 대분류, 소분류, 금액 합, 건수) 합계 행으로 대시보드용 응답을 만듦 — O(월 × 분류).
+    - totals: 수입/지출/잔액/건수
+    - expense_by_sub: 지출 소분류별 합계 (큰 순)
+    - months: 월(날짜 앞 7자리)별 수입/지출/건수
+    - categories: (대분류, 소분류)별 합계/건수
+    """
+    months = {}
+    categories = {}
+    for row_month, main, sub, amount, count in rows:
+        m = months.setdefault(row_month, {"month": row_month, "income": 0.0, "expense": 0.0, "count": 0})
+        m["count"] += count
+        if main == "수입":
+            m["income"] += amount
+        elif main == "지출":
+            m["expense"] += amount
+        c = categories.setdefault((main, sub), {"main_category": main, "sub_category": sub, "amount": 0.0, "count": 0})
+        c["amount"] += amount
+        c["count"] += count
+    return _summary_response_body(months.values(), categories.values(), month)
+
+
+def _summary_response_body(months, categories, month=None):
+    months = sorted(months, key=lambda m: m["month"])
+    categories = sorted(categories, key=lambda c: (c["main_category"], -c["amount"], c["sub_category"]))
+    income = sum(m["income"] for m in months)
+    expense = sum(m["expense"] for m in months)
+    expense_by_sub = sorted(
+        ({"sub_category": c["sub_category"], "amount": c["amount"]} for c in categories if c["main_category"] == "지출"),
+        key=lambda c: -c["amount"],
+    )
+    return {
+        "success": True,
+        "month": month,
+        "totals": {
+            "income": income,
+            "expense": expense,
+            "balance": income - expense,
+            "count": sum(m["count"] for m in months),
+        },
+        "expense_by_sub": expense_by_sub,
+        "months": months,
+        "categories": categories,
+    }
+
+
+@app.route('/api/summary', methods=['GET'])
+def api_summary():
+    """
+    대시보드용 합계. 선택 파라미터: month(YYYY-MM) — 없으면 전체 기간.
+    내역 전체 대신 월/분류별 합계만 돌려주므로 응답이 작음.
+    내역을 훑지 않고 미리 모아 둔 (월, 대분류, 소분류) 합계만 읽음
+    """
     sync_project = _extract_sync_project_from_request()
     user = request.args.get('user', 'guest')
-    data = _list_items(user, sync_project=sync_project)
-    return jsonify({"success": True, "items": data})
+    month = (request.args.get('month') or '').strip() or None
+    if month and not _MONTH_PARAM_PATTERN.match(month):
+        return jsonify({"success": False, "message": "month 는 YYYY-MM 형식이어야 합니다."}), 400
+
+    return jsonify(_summary_from_rollups(_load_rollups(user, sync_project=sync_project, month=month), month))
 
 
 @app.route('/api/add', methods=['POST'])
@@ -1489,6 +3493,11 @@ def api_clear_entries():
         return jsonify({"success": False, "message": "user가 필요합니다."}), 400
 
     user = req.get('user')
+    if _is_firestore_enabled(sync_project):
+        # 문서가 많으면 오래 걸리므로 요청 스레드를 막지 않고 작업 id 를 돌려줌
+        job = _submit_clear_job(user, sync_project)
+        return jsonify({"success": True, "job_id": job["id"], "status": job["status"]})
+
     _clear_items_for_user(user, sync_project=sync_project)
     return jsonify({"success": True})
 
@@ -1516,195 +3525,473 @@ def api_delete_user():
         return jsonify({"success": False, "message": "관리자 계정은 삭제할 수 없습니다."}), 400
 
     # 그 외에는 모두 삭제 허용 (일반 유저 김준영 포함)
-    _clear_items_for_user(user_to_delete, sync_project=sync_project)
+    job = None
+    if _is_firestore_enabled(sync_project):
+        job = _submit_clear_job(user_to_delete, sync_project)
+    else:
+        _clear_items_for_user(user_to_delete, sync_project=sync_project)
 
-    users = load_users()
-    if user_to_delete in users:
-        users.pop(user_to_delete)
-        save_users(users)
+    LOCAL_STORE.delete_user(user_to_delete)
+    _invalidate_admin_user_list()
 
+    if job is not None:
+        return jsonify({"success": True, "job_id": job["id"], "status": job["status"]})
     return jsonify({"success": True})
 
 
+# 내보내기 컬럼: (항목 키, 파일 헤더)
+EXPORT_COLUMNS = [
+    ("date", "날짜"),
+    ("amount", "금액"),
+    ("memo", "내용"),
+    ("main_category", "대분류"),
+    ("sub_category", "소분류"),
+]
+# 이 크기까지는 메모리에서 만들고, 넘으면 자동으로 임시 파일로 넘김 (닫으면 삭제됨)
+EXPORT_SPOOL_MAX_BYTES = int(os.environ.get("EXPORT_SPOOL_MAX_BYTES", str(8 * 1024 * 1024)))
+EXPORT_STREAM_CHUNK_BYTES = 64 * 1024
+
+
+EXPORT_PARQUET_ROW_GROUP = 10000
+EXPORT_FORMATS = {
+    "xlsx": {"mimetype": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"},
+    "csv": {"mimetype": "text/csv"},
+    "ndjson": {"mimetype": "application/x-ndjson"},
+    "parquet": {"mimetype": "application/vnd.apache.parquet"},
+}
+
+
+def _export_rows(items_iter):
+    for item in items_iter:
+        yield [item.get(key) for key, _ in EXPORT_COLUMNS]
+
+
+def _filter_export_items(items_iter, main_category=None, sub_category=None):
+    for item in items_iter:
+        if main_category and item.get("main_category") != main_category:
+            continue
+        if sub_category and item.get("sub_category") != sub_category:
+            continue
+        yield item
+
+
+def _write_xlsx_export(items_iter, out):
+    """openpyxl write-only 모드로 한 행씩 기록 (워크북 전체를 메모리에 만들지 않음)"""
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet("Sheet1")
+    ws.append([header for _, header in EXPORT_COLUMNS])
+    for row in _export_rows(items_iter):
+        ws.append(row)
+    wb.save(out)
+
+
+def _export_amount(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _write_parquet_export(items_iter, out):
+    """EXPORT_PARQUET_ROW_GROUP 행씩 row group 으로 기록"""
+    headers = [header for _, header in EXPORT_COLUMNS]
+    schema = pa.schema([
+        (header, pa.float64() if key == "amount" else pa.string())
+        for key, header in EXPORT_COLUMNS
+    ])
+
+    def to_batch(rows):
+        columns = list(zip(*rows)) if rows else [[] for _ in headers]
+        arrays = []
+        for (key, _), values in zip(EXPORT_COLUMNS, columns):
+            if key == "amount":
+                arrays.append(pa.array([_export_amount(v) for v in values], type=pa.float64()))
+            else:
+                arrays.append(pa.array([None if v is None else str(v) for v in values], type=pa.string()))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    with pq.ParquetWriter(out, schema) as writer:
+        rows = []
+        for row in _export_rows(items_iter):
+            rows.append(row)
+            if len(rows) >= EXPORT_PARQUET_ROW_GROUP:
+                writer.write_batch(to_batch(rows))
+                rows = []
+        if rows:
+            writer.write_batch(to_batch(rows))
+
+
+def _stream_csv_export(items_iter, chunk_rows=500):
+    """UTF-8(BOM 포함, 엑셀에서 한글이 깨지지 않도록) CSV 를 chunk_rows 행씩 생성"""
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write('\ufeff')
+    writer.writerow([header for _, header in EXPORT_COLUMNS])
+    for n, row in enumerate(_export_rows(items_iter), 1):
+        writer.writerow(row)
+        if n % chunk_rows == 0:
+            yield buf.getvalue().encode('utf-8')
+            buf.seek(0)
+            buf.truncate()
+    yield buf.getvalue().encode('utf-8')
+
+
+def _stream_ndjson_export(items_iter, chunk_rows=500):
+    """한 줄에 한 건, 키는 다른 형식과 같은 한글 컬럼명"""
+    lines = []
+    for row in _export_rows(items_iter):
+        lines.append(json.dumps(
+            {header: value for (_, header), value in zip(EXPORT_COLUMNS, row)}, ensure_ascii=False
+        ))
+        if len(lines) >= chunk_rows:
+            yield ("\n".join(lines) + "\n").encode('utf-8')
+            lines = []
+    if lines:
+        yield ("\n".join(lines) + "\n").encode('utf-8')
+
+
+def _stream_spooled_file(spool):
+    """스풀 파일을 조각으로 내보내고, 다 보내거나 연결이 끊기면 닫아서 흔적을 남기지 않음"""
+    try:
+        spool.seek(0)
+        while True:
+            chunk = spool.read(EXPORT_STREAM_CHUNK_BYTES)
+            if not chunk:
+                break
+            yield chunk
+    finally:
+        spool.close()
+
+
 @app.route('/api/download', methods=['GET'])
 def api_download():
+    """
+    선택 파라미터: format(xlsx|csv|ndjson|parquet, 기본 xlsx), from/to(YYYY-MM-DD),
+    main_category/sub_category. 모든 형식이 같은 컬럼(날짜/금액/내용/대분류/소분류)을 씀.
+    csv/ndjson 은 저장소에서 읽는 대로 바로 스트리밍하고, xlsx/parquet 은 파일 형식상
+    끝까지 써야 하므로 스풀 파일에 만든 뒤 스트리밍
+    """
     sync_project = _extract_sync_project_from_request()
     user = request.args.get('user', 'guest')
-    data = _list_items(user, sync_project=sync_project)
+    export_format = (request.args.get('format') or 'xlsx').strip().lower()
+    if export_format not in EXPORT_FORMATS:
+        return jsonify({"success": False, "message": "format 은 xlsx/csv/ndjson/parquet 중 하나여야 합니다."}), 400
+    if export_format == "parquet" and not pq.available():
+        return jsonify({"success": False, "message": "parquet 내보내기를 사용할 수 없습니다. (pyarrow 미설치)"}), 501
+    try:
+        date_from = _normalize_date_param(request.args.get('from'))
+        date_to = _normalize_date_param(request.args.get('to'))
+    except ValueError:
+        return jsonify({"success": False, "message": "from/to 값이 올바르지 않습니다."}), 400
+    main_category = (request.args.get('main_category') or '').strip() or None
+    sub_category = (request.args.get('sub_category') or '').strip() or None
+
+    items_iter = _filter_export_items(
+        _iter_items(user, sync_project=sync_project, date_from=date_from, date_to=date_to),
+        main_category=main_category, sub_category=sub_category,
+    )
+    mimetype = EXPORT_FORMATS[export_format]["mimetype"]
 
-    if not data:
-        df = pd.DataFrame(columns=["날짜", "금액", "내용", "대분류", "소분류"])
+    if export_format in ("csv", "ndjson"):
+        body = _stream_csv_export(items_iter) if export_format == "csv" else _stream_ndjson_export(items_iter)
+        response = Response(stream_with_context(body), mimetype=mimetype)
     else:
-        df = pd.DataFrame(data).rename(columns={
-            "date": "날짜",
-            "amount": "금액",
-            "memo": "내용",
-            "main_category": "대분류",
-            "sub_category": "소분류"
-        })
-        drop_cols = [c for c in ["user", "id"] if c in df.columns]
-        if drop_cols:
-            df = df.drop(columns=drop_cols)
+        spool = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_MAX_BYTES)
+        try:
+            if export_format == "xlsx":
+                _write_xlsx_export(items_iter, spool)
+            else:
+                _write_parquet_export(items_iter, spool)
+        except Exception:
+            spool.close()
+            raise
+        size = spool.tell()
+        response = Response(_stream_spooled_file(spool), mimetype=mimetype)
+        response.headers["Content-Length"] = str(size)
 
-    tmp = tempfile.NamedTemporaryFile(delete=False, suffix=".xlsx")
-    df.to_excel(tmp.name, index=False)
-    return send_file(tmp.name, as_attachment=True, download_name="가계부.xlsx")
+    response.headers["Content-Disposition"] = (
+        f"attachment; filename=\"account_book.{export_format}\"; "
+        f"filename*=UTF-8''" + quote(f"가계부.{export_format}")
+    )
+    return response
 
 
 # ------------------ CSV/XLS/XLSX IMPORT ------------------
-@app.route('/api/import', methods=['POST'])
-def api_import():
-    sync_project = _extract_sync_project_from_request()
-    if 'file' not in request.files:
-        return jsonify({"success": False, "message": "CSV/엑셀 파일이 전송되지 않았습니다."}), 400
+class _ImportFailed(Exception):
+    """가져오기를 더 진행할 수 없을 때. 메시지는 사용자에게 그대로 보여줌"""
 
-    file = request.files['file']
-    if file.filename == '':
-        return jsonify({"success": False, "message": "CSV/엑셀 파일을 선택해 주세요."}), 400
 
-    user = request.form.get('user', 'guest')
-    default_main = request.form.get('default_main', '지출') or '지출'
-    default_sub = request.form.get('default_sub', '기타지출') or '기타지출'
+IMPORT_CSV_CHUNK_ROWS = int(os.environ.get("IMPORT_CSV_CHUNK_ROWS", "5000"))
+IMPORT_SNIFF_BYTES = 64 * 1024
 
-    ext = os.path.splitext(file.filename)[1].lower()
-    raw = file.read()
 
-    # 공통 DF 처리 함수 (CSV/엑셀 공용)
-    def handle_dataframe(df):
-        if df.empty:
-            return jsonify({"success": False, "message": "파일에 데이터가 없습니다."}), 400
+def _sniff_csv_encoding(head):
+    """파일 앞부분만 보고 인코딩 결정 (UTF-8 → 실패 시 cp949, 기존 재시도 순서와 동일)"""
+    if head.startswith(codecs.BOM_UTF8):
+        return 'utf-8-sig'
+    try:
+        head.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # 앞부분을 자르다 멀티바이트 문자 중간에서 끊긴 경우는 UTF-8 로 봄
+        if e.reason != 'unexpected end of data':
+            return 'cp949'
+    return 'utf-8'
+
+
+def _normalized_batches(chunks, default_main, default_sub):
+    """DataFrame 청크를 차례로 정규화해 청크별 항목 리스트를 내보냄"""
+    seen_rows = False
+    for chunk in chunks:
+        if not seen_rows and chunk.empty:
+            break
+        seen_rows = True
+        items, error_message = _normalize_import_frame(chunk, default_main, default_sub)
+        if items is None:
+            raise _ImportFailed(error_message)
+        yield items
+    if not seen_rows:
+        raise _ImportFailed("파일에 데이터가 없습니다.")
 
-        cols = list(df.columns)
-        date_col = _find_col(
-            ['날짜', '일자', '거래일자', '거래일', '거래일시', '일시', 'date', 'Date'],
-            cols
-        )
-        amount_col = _find_col(
-            ['금액', '거래금액', '금 액', '거래금액(원)', '금액(원)', 'amount', 'Amount'],
-            cols
-        )
-        credit_col = _find_col(
-            ['입금', '입금액', '입금(원)', '입금금액', '입금금액(원)'],
-            cols
-        )
-        debit_col = _find_col(
-            ['출금', '출금액', '출금(원)', '출금금액', '출금금액(원)'],
-            cols
-        )
-        memo_col = _find_col(['내용', '적요', '메모', '설명', 'memo', 'Memo'], cols)
-        main_col = _find_col(['대분류', '구분', '수입지출', '유형', 'type', 'Type'], cols)
-        sub_col = _find_col(['소분류', '카테고리', '분류', 'category', 'Category'], cols)
-
-        if not date_col or (not amount_col and not credit_col and not debit_col):
-            return jsonify({
-                "success": False,
-                "message": "파일에 '날짜' 또는 '일시'와 '금액/입금/출금'에 해당하는 컬럼이 필요합니다."
-            }), 400
-
-        items_to_add = []
-        imported_count = 0
-
-        for _, row in df.iterrows():
-            date_val = row.get(date_col)
-            if pd.isna(date_val):
-                continue
-            date_str = str(date_val).strip()
-            if not date_str:
-                continue
 
-            memo_val = ''
-            if memo_col:
-                mv = row.get(memo_col)
-                if not pd.isna(mv):
-                    memo_val = str(mv).strip()
+def _store_import_batches(batches, user, sync_project, read_error_message, progress=None, duplicate_filter=None):
+    """
+    항목 리스트를 청크 단위로 저장하고 결과(dict)를 반환. 저장할 게 없으면 _ImportFailed.
+    batches 를 읽다 난 예외는 read_error_message 로 처리 (앞 청크가 저장됐으면 부분 성공)
+    duplicate_filter 가 있으면 이미 저장된 내역은 건너뜀 (_make_duplicate_filter)
+    progress(stats) 는 청크마다 호출되며, 예외를 던져 중단시킬 수 있음
+    """
+    batches = iter(batches)
+    stats = {"rows_parsed": 0, "rows_written": 0, "duplicates": 0, "errors": []}
+    errors = stats["errors"]
+    while True:
+        try:
+            items = next(batches, None)
+        except _ImportFailed:
+            raise
+        except Exception:
+            if stats["rows_written"] == 0:
+                raise _ImportFailed(read_error_message)
+            # 중간에 깨진 행이 있으면 그 앞까지 저장된 결과만 알려줌
+            errors.append("파일 중간에 읽을 수 없는 행이 있어 일부만 가져왔습니다.")
+            break
+        if items is None:
+            break
+        if not items:
+            continue
+        stats["rows_parsed"] += len(items)
+        if duplicate_filter is not None:
+            items, skipped = duplicate_filter(items)
+            stats["duplicates"] += skipped
+        if items:
+            saved = _add_items_bulk(user, items, sync_project=sync_project)
+            stats["rows_written"] += saved
+            if saved < len(items):
+                errors.append(f"{len(items) - saved}건을 저장하지 못했습니다.")
+        if progress is not None:
+            progress(stats)
+
+    parsed, written, duplicates = stats["rows_parsed"], stats["rows_written"], stats["duplicates"]
+    if parsed == 0:
+        raise _ImportFailed("유효한 내역을 찾지 못했습니다. 컬럼 구성을 확인해 주세요.")
+    if written == 0 and duplicates < parsed:
+        raise _ImportFailed("내역 저장에 실패했습니다. 잠시 후 다시 시도해 주세요.")
+    result = dict(stats, imported=written)
+    failed = parsed - duplicates - written
+    if failed or errors:
+        result["failed"] = failed
+        result["partial"] = True
+    return result
+
+
+def _iter_frame_slices(df, chunk_rows=IMPORT_CSV_CHUNK_ROWS):
+    """한 번에 읽은 DataFrame(엑셀 등)도 chunk_rows 행씩 나눠 저장·진행률 보고"""
+    if df.empty:
+        yield df
+        return
+    for start in range(0, len(df), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
 
-            main_category = default_main
-            amount_val = None
+def _import_csv_stream(stream, encoding, user, default_main, default_sub, sync_project,
+                       progress=None, duplicate_filter=None):
+    """
+    일반 CSV 를 IMPORT_CSV_CHUNK_ROWS 행씩 읽어 정규화/저장까지 청크 단위로 처리.
+    파일 전체를 메모리에 올리지 않으므로 큰 파일도 메모리 사용량이 일정함.
+    """
+    message = "CSV 파일을 읽을 수 없습니다."
+    try:
+        reader = pd.read_csv(stream, encoding=encoding, encoding_errors='replace',
+                             dtype=str, chunksize=IMPORT_CSV_CHUNK_ROWS)
+    except Exception:
+        raise _ImportFailed(message)
+    return _store_import_batches(_normalized_batches(reader, default_main, default_sub),
+                                 user, sync_project, message, progress, duplicate_filter)
 
-            # ① 단일 금액 컬럼이 있는 경우
-            if amount_col:
-                amount_val = _parse_amount(row.get(amount_col))
-                if amount_val is None:
-                    continue
-                if main_col:
-                    main_raw = row.get(main_col)
-                    main_category = _normalize_main_category(main_raw, default_main)
-                else:
-                    main_category = default_main
-            else:
-                # ② 입금/출금 분리된 경우
-                credit = _parse_amount(row.get(credit_col)) if credit_col else None
-                debit = _parse_amount(row.get(debit_col)) if debit_col else None
-                credit = credit or 0
-                debit = debit or 0
-                if credit == 0 and debit == 0:
-                    continue
-                if credit > 0 and debit == 0:
-                    amount_val = credit
-                    main_category = '수입'
-                elif debit > 0 and credit == 0:
-                    amount_val = debit
-                    main_category = '지출'
-                else:
-                    if abs(debit) >= abs(credit):
-                        amount_val = debit
-                        main_category = '지출'
-                    else:
-                        amount_val = credit
-                        main_category = '수입'
-
-            if sub_col:
-                sub_raw = row.get(sub_col)
-                if pd.isna(sub_raw) or str(sub_raw).strip() == '':
-                    sub_category = default_sub
-                else:
-                    sub_category = str(sub_raw).strip()
-            else:
-                sub_category = default_sub
 
-            if amount_val is None:
-                continue
+_HTML_META_CHARSET_PATTERN = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?([A-Za-z0-9_.:-]+)', re.IGNORECASE)
+_HTML_TABLE_TAG_PATTERN = re.compile(r'<(/?)(table|tr|td|th)\b[^>]*>', re.IGNORECASE)
+_HTML_ANY_TAG_PATTERN = re.compile(r'<[^>]*>')
 
-            new_item = {
-                "date": date_str,
-                "amount": amount_val,
-                "memo": memo_val,
-                "main_category": main_category,
-                "sub_category": sub_category
-            }
-            items_to_add.append(new_item)
-            imported_count += 1
 
-        if imported_count == 0:
-            return jsonify({
-                "success": False,
-                "message": "유효한 내역을 찾지 못했습니다. 컬럼 구성을 확인해 주세요."
-            }), 400
+class _HtmlTableRowParser:
+    """
+    HTML 로 저장된 .xls(국민은행 등)에서 표의 행을 읽는 증분 파서.
+    문서를 조각 단위로 feed() 하며, 새 <table> 이 시작되면 이전 표의 행은 버려서
+    항상 지금까지 본 마지막 표의 행만 들고 있음 (KB 거래내역은 마지막 표)
+    """
+
+    def __init__(self):
+        self.rows = []
+        self._buffer = ''
+        self._row = None
+        self._cell = None
+
+    def feed(self, text):
+        buffer = self._buffer + text
+        # 조각 끝에서 잘린 태그('<td cla...')는 다음 조각과 합쳐서 처리
+        cut = buffer.rfind('<')
+        if cut == -1 or buffer.find('>', cut) != -1:
+            cut = len(buffer)
+        self._scan(buffer[:cut])
+        self._buffer = buffer[cut:]
+
+    def close(self):
+        self._scan(self._buffer)
+        self._buffer = ''
+        self._end_row()
+
+    def _scan(self, text):
+        pos = 0
+        for m in _HTML_TABLE_TAG_PATTERN.finditer(text):
+            if self._cell is not None and m.start() > pos:
+                self._cell.append(text[pos:m.start()])
+            pos = m.end()
+            closing, tag = m.group(1), m.group(2).lower()
+            if closing:
+                if tag in ('td', 'th'):
+                    self._end_cell()
+                else:
+                    self._end_row()
+            elif tag == 'table':
+                self.rows = []
+                self._row = self._cell = None
+            elif tag == 'tr':
+                self._end_row()
+                self._row = []
+            else:
+                self._end_cell()
+                if self._row is None:
+                    self._row = []
+                self._cell = []
+        if self._cell is not None and pos < len(text):
+            self._cell.append(text[pos:])
+
+    def _end_cell(self):
+        if self._cell is not None:
+            # 셀 안의 <span>/<b> 등 태그를 지우고 엔티티 해제 (대부분의 셀은 해당 없음)
+            text = ''.join(self._cell)
+            if '<' in text:
+                text = _HTML_ANY_TAG_PATTERN.sub('', text)
+            if '&' in text:
+                text = html.unescape(text)
+            self._row.append(text.strip())
+            self._cell = None
+
+    def _end_row(self):
+        self._end_cell()
+        if self._row and any(self._row):
+            self.rows.append(self._row)
+        self._row = None
+
+
+def _sniff_html_encoding(head):
+    """
+    HTML 형식 .xls 의 인코딩: <meta charset> 가 있으면 그것, 없으면 CSV 와 같은 방식(UTF-8 → cp949).
+    KB 내보내기는 EUC-KR 로 표시되는 경우가 많아 EUC-KR 계열은 상위 호환인 cp949 로 읽음
+    """
+    m = _HTML_META_CHARSET_PATTERN.search(head)
+    if m:
+        try:
+            name = codecs.lookup(m.group(1).decode('ascii')).name
+        except LookupError:
+            name = None
+        if name in ('euc_kr', 'cp949', 'iso2022_kr'):
+            return 'cp949'
+        if name:
+            return name
+    return _sniff_csv_encoding(head)
+
+
+def _parse_html_table_rows(stream, chunk_size=IMPORT_SNIFF_BYTES):
+    """업로드 스트림을 조각씩 디코딩해 파서에 넣고, 마지막 표의 행 목록을 반환"""
+    block = stream.read(chunk_size)
+    decoder = codecs.getincrementaldecoder(_sniff_html_encoding(block))(errors='replace')
+    parser = _HtmlTableRowParser()
+    while block:
+        parser.feed(decoder.decode(block))
+        block = stream.read(chunk_size)
+    parser.feed(decoder.decode(b'', final=True))
+    parser.close()
+    return parser.rows
+
+
+def _iter_table_frames(header, rows, chunk_rows=IMPORT_CSV_CHUNK_ROWS):
+    """표의 행을 헤더 길이에 맞춰 보정한 뒤 chunk_rows 행씩 DataFrame 으로 만들어 줌"""
+    width = len(header)
+    for start in range(0, len(rows), chunk_rows):
+        norm_rows = [
+            row + [''] * (width - len(row)) if len(row) < width else row[:width]
+            for row in rows[start:start + chunk_rows]
+        ]
+        yield pd.DataFrame(norm_rows, columns=header)
+
+
+def _run_import(stream, ext, user, default_main, default_sub, sync_project, progress=None,
+                skip_duplicates=True):
+    """
+    업로드 파일(스트림)을 형식에 맞게 파싱해 저장. 결과 dict 반환, 실패 시 _ImportFailed.
+    skip_duplicates 면 이미 저장된 내역(같은 날짜/금액/대분류/내용)은 건너뜀
+    """
+    duplicate_filter = _make_duplicate_filter(user, sync_project) if skip_duplicates else None
 
-        _add_items_bulk(user, items_to_add, sync_project=sync_project)
-        return jsonify({"success": True, "imported": imported_count})
+    def store_frames(frames, read_error_message):
+        return _store_import_batches(_normalized_batches(frames, default_main, default_sub),
+                                     user, sync_project, read_error_message, progress, duplicate_filter)
 
     # ------------------ 1) 엑셀: xlsx ------------------
     if ext == '.xlsx':
+        xlsx_error = "엑셀(xlsx) 파일을 읽을 수 없습니다."
         try:
-            df = pd.read_excel(io.BytesIO(raw))
+            df = pd.read_excel(stream)
         except Exception:
-            return jsonify({"success": False, "message": "엑셀(xlsx) 파일을 읽을 수 없습니다."}), 400
-        return handle_dataframe(df)
+            raise _ImportFailed(xlsx_error)
+        return store_frames(_iter_frame_slices(df), xlsx_error)
 
     # ------------------ 2) 엑셀: xls (KB HTML 형식 포함) ------------------
     if ext == '.xls':
+        xls_error = "엑셀(xls) 파일을 읽을 수 없습니다. (HTML 형식 표 구조를 파싱하지 못했습니다.)"
         # 1단계: 진짜 엑셀 형식인지 먼저 시도
         try:
-            df = pd.read_excel(io.BytesIO(raw))
-            return handle_dataframe(df)
+            df = pd.read_excel(stream)
         except Exception:
-            pass  # 실패하면 HTML 가능성을 보고 다음 단계로
+            df = None
+            stream.seek(0)  # 실패하면 HTML 가능성을 보고 다음 단계로
+        if df is not None:
+            return store_frames(_iter_frame_slices(df), xls_error)
 
-        # 2단계: pandas.read_html() 시도 (환경에 따라 안 될 수 있음)
-        tables = None
+        # 2단계: 의존성 없이 마지막 <table> 의 행만 증분 파싱
         try:
-            tables = pd.read_html(io.BytesIO(raw))
+            table_rows = _parse_html_table_rows(stream)
+        except Exception:
+            table_rows = []
+
+        if len(table_rows) > 1 and _has_import_columns(table_rows[0]):
+            return store_frames(_iter_table_frames(table_rows[0], table_rows[1:]), xls_error)
+
+        # 3단계: 헤더를 찾지 못했으면 pandas.read_html() 시도 (lxml 등이 있는 환경에서만 동작)
+        stream.seek(0)
+        try:
+            tables = pd.read_html(stream)
         except Exception:
             tables = None
 
@@ -1715,120 +4002,132 @@ def api_import():
                 df.columns = df.iloc[0]
                 df = df.iloc[1:]
             df = df.reset_index(drop=True)
-            return handle_dataframe(df)
-
-        # 3단계: 의존성 없이 HTML <table> 직접 파싱
-        import re as _re
-        import html as _html
-        try:
-            text = raw.decode('utf-8', errors='ignore')
-            tables_html = _re.findall(
-                r'(<table.*?>.*?</table>)',
-                text,
-                flags=_re.DOTALL | _re.IGNORECASE
-            )
-            if not tables_html:
-                raise ValueError("no <table> tags found")
-
-            # KB 거래내역 기준: 마지막 테이블이 실제 거래내역
-            last_table = tables_html[-1]
-
-            rows = _re.findall(
-                r'<tr.*?>(.*?)</tr>',
-                last_table,
-                flags=_re.DOTALL | _re.IGNORECASE
-            )
-
-            table_data = []
-            for r in rows:
-                cells = _re.findall(
-                    r'<t[dh][^>]*>(.*?)</t[dh]>',
-                    r,
-                    flags=_re.DOTALL | _re.IGNORECASE
-                )
-                if not cells:
-                    continue
-                clean_cells = []
-                for c in cells:
-                    # 태그 제거
-                    c2 = _re.sub(r'<.*?>', '', c, flags=_re.DOTALL)
-                    c2 = _html.unescape(c2).strip()
-                    clean_cells.append(c2)
-                if any(clean_cells):
-                    table_data.append(clean_cells)
-
-            if len(table_data) <= 1:
-                raise ValueError("not enough rows in table")
-
-            header = table_data[0]
-            rows_data = table_data[1:]
-            width = len(header)
-
-            # 행 길이를 헤더 길이에 맞게 보정
-            norm_rows = [
-                row + [''] * (width - len(row)) if len(row) < width else row[:width]
-                for row in rows_data
-            ]
-
-            df = pd.DataFrame(norm_rows, columns=header)
-            return handle_dataframe(df)
-
-        except Exception:
-            return jsonify({
-                "success": False,
-                "message": "엑셀(xls) 파일을 읽을 수 없습니다. (HTML 형식 표 구조를 파싱하지 못했습니다.)"
-            }), 400
-
-    # ------------------ 3) (기존) CSV: 국민은행 '행 단위' 포맷 시도 ------------------
-    kb_row_items = parse_kb_kukmin_row(raw)
-    if kb_row_items is not None:
-        items_to_add = []
-        imported_count = 0
-        for item in kb_row_items:
-            new_item = {
-                "date": item["date"],
-                "amount": item["amount"],
-                "memo": item["memo"],
-                "main_category": item["main_category"],
-                "sub_category": item["sub_category"]
-            }
-            items_to_add.append(new_item)
-            imported_count += 1
-        if imported_count == 0:
-            return jsonify({"success": False, "message": "유효한 내역을 찾지 못했습니다. CSV 내용을 확인해 주세요."}), 400
-        _add_items_bulk(user, items_to_add, sync_project=sync_project)
-        return jsonify({"success": True, "imported": imported_count})
-
-    # ------------------ 4) (기존) CSV: 국민은행 블록 포맷 시도 ------------------
-    kb_block_items = parse_kb_kukmin_block(raw)
-    if kb_block_items is not None:
-        items_to_add = []
-        imported_count = 0
-        for item in kb_block_items:
-            new_item = {
+            return store_frames(_iter_frame_slices(df), xls_error)
+
+        raise _ImportFailed(xls_error)
+
+    head = stream.read(IMPORT_SNIFF_BYTES)
+    stream.seek(0)
+    kb_kind = _classify_kb_export(head)
+    if kb_kind is None:
+        return _import_csv_stream(stream, _sniff_csv_encoding(head), user,
+                                  default_main, default_sub, sync_project, progress, duplicate_filter)
+    raw = stream.read()
+
+    # ------------------ 3) CSV: 국민은행 행 단위/블록 포맷 (앞부분으로 추정한 포맷부터 시도) ------------------
+    kb_items = parse_kb_kukmin(raw, kb_kind)
+    if kb_items is not None:
+        items_to_add = [
+            {
                 "date": item["date"],
                 "amount": item["amount"],
                 "memo": item["memo"],
                 "main_category": item["main_category"],
                 "sub_category": item["sub_category"]
             }
-            items_to_add.append(new_item)
-            imported_count += 1
-        if imported_count == 0:
-            return jsonify({"success": False, "message": "유효한 내역을 찾지 못했습니다. CSV 내용을 확인해 주세요."}), 400
-        _add_items_bulk(user, items_to_add, sync_project=sync_project)
-        return jsonify({"success": True, "imported": imported_count})
-
-    # ------------------ 5) (기존) 일반 CSV ------------------
-    try:
-        df = pd.read_csv(io.BytesIO(raw))
-    except Exception:
+            for item in kb_items
+        ]
+        batches = (items_to_add[i:i + IMPORT_CSV_CHUNK_ROWS]
+                   for i in range(0, len(items_to_add), IMPORT_CSV_CHUNK_ROWS))
+        return _store_import_batches(batches, user, sync_project, "CSV 파일을 읽을 수 없습니다.",
+                                     progress, duplicate_filter)
+
+    # ------------------ 4) (기존) 일반 CSV ------------------
+    return _import_csv_stream(io.BytesIO(raw), _sniff_csv_encoding(head), user,
+                              default_main, default_sub, sync_project, progress, duplicate_filter)
+
+
+def _submit_import_job(spool_path, ext, user, default_main, default_sub, sync_project, skip_duplicates=True):
+    """임시 저장한 업로드 파일의 파싱/저장을 백그라운드 작업으로 실행"""
+    def target(job):
+        def progress(stats):
+            job.update(stats)
+            job["errors"] = list(stats["errors"])
+            _save_job(job)
+            if _job_cancel_requested(job["id"]):
+                raise _JobCancelled()
+
         try:
-            df = pd.read_csv(io.BytesIO(raw), encoding='cp949')
-        except Exception:
-            return jsonify({"success": False, "message": "CSV 파일을 읽을 수 없습니다."}), 400
+            with open(spool_path, 'rb') as stream:
+                return _run_import(stream, ext, user, default_main, default_sub, sync_project,
+                                   progress, skip_duplicates)
+        finally:
+            try:
+                os.remove(spool_path)
+            except OSError:
+                pass
+
+    return _submit_job("import", target, user=_normalize_user_key(user),
+                       rows_parsed=0, rows_written=0, duplicates=0, errors=[])
+
+
+@app.route('/api/import', methods=['POST'])
+def api_import():
+    """
+    업로드 파일을 IMPORT_SPOOL_DIR 에 저장하고 job_id 를 바로 반환.
+    파싱/저장은 작업 스레드에서 진행되며 /api/import/status 로 진행 상황 조회
+    """
+    sync_project = _extract_sync_project_from_request()
+    if 'file' not in request.files:
+        return jsonify({"success": False, "message": "CSV/엑셀 파일이 전송되지 않았습니다."}), 400
+
+    file = request.files['file']
+    if file.filename == '':
+        return jsonify({"success": False, "message": "CSV/엑셀 파일을 선택해 주세요."}), 400
+
+    user = request.form.get('user', 'guest')
+    default_main = request.form.get('default_main', '지출') or '지출'
+    default_sub = request.form.get('default_sub', '기타지출') or '기타지출'
+    # 기본은 이미 가져온 내역 건너뛰기 (겹치는 기간의 명세서를 다시 올려도 중복 저장 안 됨)
+    skip_duplicates = str(request.form.get('skip_duplicates', '1')).strip().lower() not in ('0', 'false', 'no')
+
+    ext = os.path.splitext(file.filename)[1].lower()
+    os.makedirs(IMPORT_SPOOL_DIR, exist_ok=True)
+    spool_path = os.path.join(IMPORT_SPOOL_DIR, secrets.token_urlsafe(12) + (ext if ext in ('.csv', '.xls', '.xlsx') else ''))
+    try:
+        file.save(spool_path)
+    except OSError as e:
+        print(f"[WARN] import spool write failed: {e}")
+        return jsonify({"success": False, "message": "파일을 저장하지 못했습니다. 잠시 후 다시 시도해 주세요."}), 500
+
+    job = _submit_import_job(spool_path, ext, user, default_main, default_sub, sync_project, skip_duplicates)
+    return jsonify({"success": True, "job_id": job["id"], "job": job})
+
+
+def _load_import_job():
+    job_id = request.args.get('job_id')
+    if job_id is None:
+        body = request.get_json(silent=True) or {}
+        job_id = body.get('job_id')
+    job = _load_job(job_id)
+    if job is None or job.get("kind") != "import":
+        return None
+    return job
 
-    return handle_dataframe(df)
+
+@app.route('/api/import/status', methods=['GET'])
+def api_import_status():
+    job = _load_import_job()
+    if job is None:
+        return jsonify({"success": False, "message": "가져오기 작업을 찾을 수 없습니다."}), 404
+    if job["status"] in ("queued", "running") and _job_cancel_requested(job["id"]):
+        job["cancel_requested"] = True
+    return jsonify({"success": True, "job": job})
+
+
+@app.route('/api/import/cancel', methods=['POST'])
+def api_import_cancel():
+    """
+    가져오기 작업 취소 요청. 처리 중인 청크까지는 저장되고 그 뒤부터 중단됨
+    (이미 저장된 rows_written 건은 그대로 남음)
+    """
+    job = _load_import_job()
+    if job is None:
+        return jsonify({"success": False, "message": "가져오기 작업을 찾을 수 없습니다."}), 404
+    if job["status"] not in ("queued", "running"):
+        return jsonify({"success": False, "message": "이미 끝난 작업입니다.", "job": job}), 409
+    _request_job_cancel(job["id"])
+    return jsonify({"success": True, "job_id": job["id"]})
 
 
 if __name__ == '__main__':
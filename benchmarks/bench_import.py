@@ -0,0 +1,369 @@
+"""
+가져오기 경로 벤치마크 (큰 명세서 픽스처를 만들어 측정).
+
+- frame: 카드/통장 입출금 DataFrame 정규화 — _normalize_import_frame 과
+  예전 df.iterrows() 방식(아래 _iterrows_reference)을 비교
+- kb-row / kb-block: 국민은행 행/블록 형식 명세서 — parse_kb_kukmin 과
+  예전 행 → 블록 파서 순서(아래 _kb_row_reference / _kb_block_reference) 비교
+
+결과가 예전 구현과 다르거나 속도 향상이 --min-speedup 보다 작으면 0 이 아닌 코드로 끝남.
+
+    python benchmarks/bench_import.py
+    python benchmarks/bench_import.py --rows 200000 --fixture-dir /tmp/kb --min-speedup 1.2
+"""
+import argparse
+import os
+import re
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _import_app():
+    # data.json / users.json 등이 저장소 디렉터리에 생기지 않도록 임시 디렉터리에서 import
+    sys.path.insert(0, ROOT)
+    os.chdir(tempfile.mkdtemp(prefix="bench-import-"))
+    import app
+    return app
+
+
+# ---- 픽스처 ----
+def make_kb_row_fixture(rows):
+    return "\n".join(
+        f"2024.{i % 12 + 1:02d}.{i % 28 + 1:02d} 12:{i % 60:02d}:00 가맹점{i % 300} "
+        f"{i % 7 * 1000:,} {(i % 5 == 0) * 3000:,} {i * 10:,}"
+        for i in range(rows)
+    ).encode("utf-8")
+
+
+def make_kb_block_fixture(blocks):
+    return "\n".join(
+        f"2024.{i % 12 + 1:02d}.{i % 28 + 1:02d} 가맹점{i % 300}\n이체 {i % 7 * 1000:,} 0 {i * 10:,}\n12:00\n/"
+        for i in range(blocks)
+    ).encode("utf-8")
+
+
+def make_frame_fixture(pd, rows):
+    return pd.DataFrame({
+        "거래일자": [f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}" for i in range(rows)],
+        "적요": [f"가맹점{i % 300}" for i in range(rows)],
+        "출금액": [f"{i % 7 * 1000:,}원" if i % 3 else "" for i in range(rows)],
+        "입금액": [f"{i % 5 * 2500:,}" if i % 3 == 0 else "0" for i in range(rows)],
+        "분류": ["" if i % 4 == 0 else f"분류{i % 9}" for i in range(rows)],
+    }, dtype=object)
+
+
+# ---- 예전 구현 (df.iterrows / 국민은행 정규식 파서) ----
+def _normalize_main_category_reference(value, default_main):
+    """user-011 이전 app._normalize_main_category (행 단위 대분류 판별, 비교용)"""
+    s = str(value).strip()
+    if s in ('수입', '입금', 'Income', 'income'):
+        return '수입'
+    if s in ('지출', '출금', 'Expense', 'expense', '지 급'):
+        return '지출'
+    return default_main
+
+
+def _iterrows_reference(app, df, default_main, default_sub):
+    """user-011 이전 handle_dataframe 의 행 단위 루프 (비교용)"""
+    pd = app.pd
+    cols = list(df.columns)
+    date_col = app._find_col(app.IMPORT_DATE_COLUMNS, cols)
+    amount_col = app._find_col(app.IMPORT_AMOUNT_COLUMNS, cols)
+    credit_col = app._find_col(app.IMPORT_CREDIT_COLUMNS, cols)
+    debit_col = app._find_col(app.IMPORT_DEBIT_COLUMNS, cols)
+    memo_col = app._find_col(app.IMPORT_MEMO_COLUMNS, cols)
+    main_col = app._find_col(app.IMPORT_MAIN_COLUMNS, cols)
+    sub_col = app._find_col(app.IMPORT_SUB_COLUMNS, cols)
+    items = []
+    for _, row in df.iterrows():
+        date_val = row.get(date_col)
+        if pd.isna(date_val) or not str(date_val).strip():
+            continue
+        memo_val = ''
+        if memo_col and not pd.isna(row.get(memo_col)):
+            memo_val = str(row.get(memo_col)).strip()
+        main_category = default_main
+        if amount_col:
+            amount_val = app._parse_amount(row.get(amount_col))
+            if amount_val is None:
+                continue
+            if main_col:
+                main_category = _normalize_main_category_reference(row.get(main_col), default_main)
+        else:
+            credit = (app._parse_amount(row.get(credit_col)) if credit_col else None) or 0
+            debit = (app._parse_amount(row.get(debit_col)) if debit_col else None) or 0
+            if credit == 0 and debit == 0:
+                continue
+            if credit > 0 and debit == 0:
+                amount_val, main_category = credit, '수입'
+            elif debit > 0 and credit == 0:
+                amount_val, main_category = debit, '지출'
+            elif abs(debit) >= abs(credit):
+                amount_val, main_category = debit, '지출'
+            else:
+                amount_val, main_category = credit, '수입'
+        sub_category = default_sub
+        if sub_col:
+            sub_raw = row.get(sub_col)
+            if not pd.isna(sub_raw) and str(sub_raw).strip() != '':
+                sub_category = str(sub_raw).strip()
+        items.append({"date": str(date_val).strip(), "amount": amount_val, "memo": memo_val,
+                      "main_category": main_category, "sub_category": sub_category})
+    return items
+
+
+def _kb_block_reference(raw_bytes):
+    """user-011 이전 parse_kb_kukmin_block (블록 형식, 비교용)"""
+    text = raw_bytes.decode('utf-8', errors='ignore')
+    lines = [ln.strip().strip('"') for ln in text.splitlines()]
+
+    date_pattern = re.compile(r'^\s*\d{4}\.\d{2}\.\d{2}')
+
+    def detect_start(lines_):
+        for i in range(len(lines_) - 3):
+            if date_pattern.match(lines_[i]):
+                nums = re.findall(r'[\d,]+', lines_[i + 1])
+                if len(nums) >= 2:
+                    return i
+        return None
+
+    start = detect_start(lines)
+    if start is None:
+        return None
+
+    records = []
+    i = start
+    while i + 2 < len(lines):
+        date_line = lines[i]
+        info_line = lines[i + 1]
+        time_line = lines[i + 2]
+
+        m = date_pattern.match(date_line)
+        if not m:
+            break
+
+        y, mth, d = date_line[m.start():m.end()].split('.')
+        date_str = f"{y}-{mth}-{d}"
+
+        nums = [int(n.replace(',', '')) for n in re.findall(r'[\d,]+', info_line)]
+        if len(nums) >= 3:
+            amt1, amt2, balance = nums[0], nums[1], nums[2]
+        elif len(nums) == 2:
+            amt1, amt2, balance = nums[0], 0, nums[1]
+        else:
+            i += 4
+            continue
+
+        base_memo = date_line[m.end():].strip()
+        prefix = re.split(r'\d', info_line, 1)[0].strip()
+
+        desc_parts = []
+        if base_memo:
+            desc_parts.append(base_memo)
+        if prefix and prefix not in base_memo:
+            desc_parts.append(prefix)
+
+        money_desc = []
+        if amt1 and amt2:
+            money_desc.append(f"금액1 {amt1:,}원")
+            money_desc.append(f"금액2 {amt2:,}원")
+        elif amt1:
+            money_desc.append(f"{amt1:,}원")
+        elif amt2:
+            money_desc.append(f"{amt2:,}원")
+
+        money_desc.append(f"잔액 {balance:,}원")
+        desc_parts.extend(money_desc)
+
+        time_clean = time_line.strip()
+        if time_clean:
+            desc_parts.append(f"시간 {time_clean}")
+
+        memo = " / ".join(desc_parts) if desc_parts else "KB 거래"
+
+        records.append({
+            "date": date_str,
+            "amt1": amt1,
+            "amt2": amt2,
+            "balance": balance,
+            "memo": memo,
+        })
+        i += 4
+
+    if not records:
+        return None
+
+    items = []
+    prev_bal = None
+    for r in records:
+        bal = r["balance"]
+        if prev_bal is None:
+            if r["amt1"] and not r["amt2"]:
+                amount = r["amt1"]
+                main_category = "지출"
+            elif r["amt2"] and not r["amt1"]:
+                amount = r["amt2"]
+                main_category = "수입"
+            else:
+                prev_bal = bal
+                continue
+        else:
+            delta = bal - prev_bal
+            if delta > 0:
+                amount = delta
+                main_category = "수입"
+            elif delta < 0:
+                amount = -delta
+                main_category = "지출"
+            else:
+                prev_bal = bal
+                continue
+
+        prev_bal = bal
+        sub_category = "기타수입" if main_category == "수입" else "기타지출"
+        items.append({
+            "date": r["date"],
+            "amount": amount,
+            "main_category": main_category,
+            "sub_category": sub_category,
+            "memo": r["memo"]
+        })
+
+    if not items:
+        return None
+    return items
+
+
+def _kb_row_reference(raw_bytes):
+    """user-011 이전 parse_kb_kukmin_row (행 단위 형식, 비교용)"""
+    text = raw_bytes.decode('utf-8', errors='ignore')
+    lines = [ln.strip().strip('"') for ln in text.splitlines()]
+
+    dt_pattern = re.compile(r'^\s*(\d{4}\.\d{2}\.\d{2})\s+(\d{2}:\d{2}:\d{2})')
+
+    items = []
+    for idx, line in enumerate(lines):
+        m = dt_pattern.match(line)
+        if not m:
+            continue
+        date_raw = m.group(1)
+        date_str = date_raw.replace('.', '-')
+        tail = line[m.end():].strip()
+
+        nums = [int(n.replace(',', '')) for n in re.findall(r'[\d,]+', tail)]
+        if len(nums) < 2:
+            continue
+        amt1, amt2 = nums[0], nums[1]
+
+        if amt1 != 0 and amt2 == 0:
+            amount = amt1
+            main_category = '지출'
+        elif amt2 != 0 and amt1 == 0:
+            amount = amt2
+            main_category = '수입'
+        else:
+            if abs(amt1) >= abs(amt2):
+                amount = amt1
+                main_category = '지출'
+            else:
+                amount = amt2
+                main_category = '수입'
+
+        prev_line = lines[idx - 1].strip() if idx > 0 else ''
+        seg = re.split(r'[\d,]', tail, 1)[0].strip()
+
+        parts = []
+        if prev_line and not dt_pattern.match(prev_line) and prev_line not in ('/',):
+            parts.append(prev_line)
+        if seg:
+            parts.append(seg)
+
+        seen = set()
+        parts_clean = []
+        for p in parts:
+            if p not in seen:
+                seen.add(p)
+                parts_clean.append(p)
+
+        memo = " / ".join(parts_clean) if parts_clean else "KB 거래"
+        sub_category = "기타수입" if main_category == "수입" else "기타지출"
+
+        items.append({
+            "date": date_str,
+            "amount": amount,
+            "main_category": main_category,
+            "sub_category": sub_category,
+            "memo": memo
+        })
+
+    if not items:
+        return None
+    return items
+
+
+def _timed(fn, *args):
+    started = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - started
+
+
+def _sorted_items(items):
+    return [dict(sorted(item.items())) for item in items or []]
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=200000, help="KB 행 형식 명세서 줄 수 (블록 형식은 1/4)")
+    parser.add_argument("--frame-rows", type=int, default=50000, help="입출금 DataFrame 행 수")
+    parser.add_argument("--min-speedup", type=float, default=1.1, help="각 항목이 넘어야 하는 최소 속도 향상 배수")
+    parser.add_argument("--fixture-dir", default=None, help="만든 픽스처를 저장할 디렉터리")
+    args = parser.parse_args(argv)
+
+    app = _import_app()
+
+    fixtures = {
+        "kb-row": make_kb_row_fixture(args.rows),
+        "kb-block": make_kb_block_fixture(args.rows // 4),
+    }
+    if args.fixture_dir:
+        os.makedirs(args.fixture_dir, exist_ok=True)
+        for name, data in fixtures.items():
+            with open(os.path.join(args.fixture_dir, f"{name}.csv"), "wb") as f:
+                f.write(data)
+
+    failures = []
+
+    def report(name, old, new, same):
+        speedup = old / new if new else float("inf")
+        print(f"{name:9s} old {old:7.3f}s  new {new:7.3f}s  x{speedup:5.1f}  {'same' if same else 'DIFFERENT'}")
+        if not same:
+            failures.append(f"{name}: output differs from the old implementation")
+        elif speedup < args.min_speedup:
+            failures.append(f"{name}: speedup x{speedup:.2f} < x{args.min_speedup}")
+
+    df = make_frame_fixture(app.pd, args.frame_rows)
+    old_items, old_t = _timed(_iterrows_reference, app, df, "지출", "기타")
+    (new_items, error), new_t = _timed(app._normalize_import_frame, df, "지출", "기타")
+    report("frame", old_t, new_t, error is None and _sorted_items(old_items) == _sorted_items(new_items))
+
+    for name, data in fixtures.items():
+        def old_parse(raw):
+            items = _kb_row_reference(raw)
+            return items if items is not None else _kb_block_reference(raw)
+
+        old_items, old_t = _timed(old_parse, data)
+        new_items, new_t = _timed(
+            lambda raw: app.parse_kb_kukmin(raw, app._classify_kb_export(raw[:app.IMPORT_SNIFF_BYTES])), data
+        )
+        report(name, old_t, new_t, _sorted_items(old_items) == _sorted_items(new_items))
+
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
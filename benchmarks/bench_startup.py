@@ -0,0 +1,73 @@
+"""
+워커 부팅 시간 점검: 새 인터프리터에서 app 을 import 하고 CRUD 경로(add / list / login)만 호출.
+- import 시간이 --budget 초를 넘으면 실패
+- 그 뒤에도 pandas / numpy / openpyxl / pyarrow 가 sys.modules 에 있으면 실패
+
+    python benchmarks/bench_startup.py
+    python benchmarks/bench_startup.py --budget 0.5 --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HEAVY_MODULES = ("pandas", "numpy", "openpyxl", "pyarrow")
+
+# 자식 인터프리터에서 실행 (이 스크립트가 이미 import 한 모듈이 섞이지 않도록)
+CHILD_CODE = r"""
+import json, sys, time
+started = time.perf_counter()
+sys.path.insert(0, sys.argv[1])
+import app
+boot = time.perf_counter() - started
+client = app.app.test_client()
+started = time.perf_counter()
+client.post('/api/user_register', json={'user': 'bench', 'password': 'pw'})
+client.post('/api/user_login', json={'user': 'bench', 'password': 'pw'})
+client.post('/api/add', json={'user': 'bench', 'date': '2024-01-01', 'amount': '1000',
+                              'memo': 'bench', 'main_category': '지출', 'sub_category': '식비'})
+client.get('/api/list?user=bench')
+client.get('/api/list?user=bench&limit=10')
+crud = time.perf_counter() - started
+heavy = sorted(name for name in json.loads(sys.argv[2]) if name in sys.modules)
+print(json.dumps({"boot": boot, "crud": crud, "heavy": heavy}))
+"""
+
+
+def run_once():
+    env = dict(os.environ, FIRESTORE_WARMUP_TARGETS="")
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD_CODE, ROOT, json.dumps(HEAVY_MODULES)],
+        cwd=tempfile.mkdtemp(prefix="bench-startup-"), env=env, capture_output=True, text=True, check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--budget", type=float, default=float(os.environ.get("BOOT_BUDGET_SECONDS", "0.5")),
+                        help="import app 에 허용하는 최대 시간(초), 여러 번 중 가장 빠른 값 기준")
+    parser.add_argument("--runs", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    results = [run_once() for _ in range(args.runs)]
+    boot = min(r["boot"] for r in results)
+    crud = min(r["crud"] for r in results)
+    heavy = sorted({name for r in results for name in r["heavy"]})
+    print(f"boot {boot:.3f}s (budget {args.budget:.3f}s)  crud requests {crud * 1000:.1f}ms  heavy loaded: {heavy or 'none'}")
+
+    failures = []
+    if boot > args.budget:
+        failures.append(f"boot {boot:.3f}s exceeds budget {args.budget:.3f}s")
+    if heavy:
+        failures.append(f"heavy modules loaded on CRUD paths: {', '.join(heavy)}")
+    for failure in failures:
+        print(f"FAIL {failure}")
+    return 1 if failures else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())